@@ -23,6 +23,7 @@ import sys
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go  # type: ignore[reportMissingTypeStubs]
 
@@ -92,14 +93,24 @@ def plot_cts_tree_interactive(
     buffers = cts_data.get("buffers", [])
     connections = cts_data.get("connections", [])
 
-    xs_sinks = [s["x"] for s in sinks]
-    ys_sinks = [s["y"] for s in sinks]
-    names_sinks = [s.get("name", "") for s in sinks]
-
-    xb = [b["x"] for b in buffers]
-    yb = [b["y"] for b in buffers]
-    levels = [b.get("level", 0) for b in buffers]
-    names_bufs = [b.get("name", "") for b in buffers]
+    # Typed coordinate arrays filled in one pass each (float32 feeds WebGL directly)
+    n_sinks = len(sinks)
+    xs_sinks = np.empty(n_sinks, dtype=np.float32)
+    ys_sinks = np.empty(n_sinks, dtype=np.float32)
+    names_sinks = np.empty(n_sinks, dtype=object)
+    for i, s in enumerate(sinks):
+        xs_sinks[i] = s["x"]
+        ys_sinks[i] = s["y"]
+        names_sinks[i] = s.get("name", "")
+
+    n_bufs = len(buffers)
+    xb = np.empty(n_bufs, dtype=np.float32)
+    yb = np.empty(n_bufs, dtype=np.float32)
+    texts_bufs = np.empty(n_bufs, dtype=object)
+    for i, b in enumerate(buffers):
+        xb[i] = b["x"]
+        yb[i] = b["y"]
+        texts_bufs[i] = f"{b.get('name', '')}<br>level={b.get('level', 0)}"
 
     fig = go.Figure()
 
@@ -136,7 +147,7 @@ def plot_cts_tree_interactive(
             mode="markers",
             marker=dict(size=9, symbol="triangle-up"),
             name="CTS Buffers",
-            text=[f"{n}<br>level={lvl}" for n, lvl in zip(names_bufs, levels)],
+            text=texts_bufs,
             hovertemplate="%{text}<br>x=%{x:.1f}, y=%{y:.1f}<extra></extra>",
         )
     )
@@ -169,15 +180,17 @@ def plot_cts_tree_interactive(
     )
 
     # Auto-zoom to the data region (logic + sinks + buffers)
-    all_x = list(x_logic) + xs_sinks + xb
-    all_y = list(y_logic) + ys_sinks + yb
-    if all_x and all_y:
-        span_x = max(all_x) - min(all_x)
-        span_y = max(all_y) - min(all_y)
+    all_x = np.concatenate([x_logic.to_numpy(dtype=np.float64), xs_sinks, xb])
+    all_y = np.concatenate([y_logic.to_numpy(dtype=np.float64), ys_sinks, yb])
+    if all_x.size and all_y.size:
+        min_x, max_x = float(all_x.min()), float(all_x.max())
+        min_y, max_y = float(all_y.min()), float(all_y.max())
+        span_x = max_x - min_x
+        span_y = max_y - min_y
         pad_x = span_x * 0.05 if span_x > 0 else 10
         pad_y = span_y * 0.05 if span_y > 0 else 10
-        fig.update_xaxes(range=[min(all_x) - pad_x, max(all_x) + pad_x])
-        fig.update_yaxes(range=[min(all_y) - pad_y, max(all_y) + pad_y])
+        fig.update_xaxes(range=[min_x - pad_x, max_x + pad_x])
+        fig.update_yaxes(range=[min_y - pad_y, max_y + pad_y])
 
     # Ensure HTML suffix
     out = Path(output_path)
@@ -186,10 +199,12 @@ def plot_cts_tree_interactive(
 
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    # Write to HTML
+    # Write to HTML. "directory" emits a single shared plotly.min.js next to
+    # the HTML (written once, reused by every design rendered into that dir)
+    # instead of fetching it from the CDN each time the file is opened.
     fig.write_html(
         str(out),
-        include_plotlyjs="cdn",
+        include_plotlyjs="directory",
         full_html=True,
         auto_open=False,
     )
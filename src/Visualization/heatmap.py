@@ -1,9 +1,55 @@
 import os
 from pathlib import Path
-from typing import Union, Optional
+from typing import Dict, Union, Optional
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from PIL import Image, ImageDraw
+
+# Multi-threaded CSV parsing when pyarrow is installed
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+# Colormap name -> (256, 4) uint8 RGBA lookup table
+_LUT_CACHE: Dict[str, np.ndarray] = {}
+
+
+def _colormap_lut(cmap: str) -> np.ndarray:
+    """Return a 256-entry RGBA lookup table for a matplotlib colormap name.
+
+    Only the colormap registry is imported (no pyplot / figure machinery),
+    and each table is built once per process.
+    """
+    lut = _LUT_CACHE.get(cmap)
+    if lut is None:
+        from matplotlib import colormaps
+        lut = (colormaps[cmap](np.linspace(0.0, 1.0, 256)) * 255).astype(np.uint8)
+        _LUT_CACHE[cmap] = lut
+    return lut
+
+
+def _histogram2d_bincount(x: np.ndarray, y: np.ndarray, bins: int):
+    """Equal-width 2D histogram via a single ``np.bincount`` pass.
+
+    Matches ``np.histogram2d(x, y, bins=bins)`` for integer ``bins``: the
+    range spans the data min/max (widened by 0.5 for a degenerate axis) and
+    the right-most bin edge is inclusive.
+    """
+    def _axis_index(v: np.ndarray):
+        v_min, v_max = float(v.min()), float(v.max())
+        if v_min == v_max:
+            v_min, v_max = v_min - 0.5, v_max + 0.5
+        idx = ((v - v_min) * (bins / (v_max - v_min))).astype(np.intp)
+        np.minimum(idx, bins - 1, out=idx)
+        return idx, np.linspace(v_min, v_max, bins + 1)
+
+    ix, x_edges = _axis_index(x)
+    iy, y_edges = _axis_index(y)
+    H = np.bincount(ix * bins + iy, minlength=bins * bins).reshape(bins, bins)
+    return H, x_edges, y_edges
 
 
 def plot_placement_heatmap(
@@ -17,14 +63,18 @@ def plot_placement_heatmap(
     title: Optional[str] = None,
 ) -> None:
     """Generate a placement density heatmap from a CSV file or DataFrame.
-    
+
+    The density grid is colormapped with a NumPy lookup table and written
+    directly as a PNG through Pillow, skipping the matplotlib figure pipeline.
+
     Args:
         data: Either a path to a CSV file (str or Path) or a pandas DataFrame
         x_col: Column name for x coordinates (default: "x_um")
         y_col: Column name for y coordinates (default: "y_um")
         bins: Number of bins for 2D histogram (default: 80)
         cmap: Colormap name (default: "viridis")
-        figsize: Figure size tuple (default: (10, 8))
+        figsize: Image size in inches at 100 px/inch; the width is used and
+            the height follows the placement aspect ratio (default: (10, 8))
         output_path: Path to save the heatmap image (if None, displays instead)
         title: Optional title for the plot (if None, auto-generates from data source)
     """
@@ -34,7 +84,17 @@ def plot_placement_heatmap(
         if not csv_path.exists():
             print(f"[WARNING] Cannot create heatmap: CSV file not found: {csv_path}")
             return
-        df = pd.read_csv(csv_path)
+        # Only the two coordinate columns are parsed, straight into float32
+        header = pd.read_csv(csv_path, nrows=0).columns
+        if x_col not in header or y_col not in header:
+            print(f"[WARNING] Cannot create heatmap: missing columns {x_col} or {y_col}")
+            return
+        df = pd.read_csv(
+            csv_path,
+            usecols=[x_col, y_col],
+            dtype={x_col: np.float32, y_col: np.float32},
+            engine="pyarrow" if PYARROW_AVAILABLE else "c",
+        )
         data_source_name = csv_path.stem
     elif isinstance(data, pd.DataFrame):
         df = data
@@ -42,54 +102,53 @@ def plot_placement_heatmap(
     else:
         print(f"[WARNING] Cannot create heatmap: invalid data type: {type(data)}")
         return
-    
+
     # Validate required columns exist
     if x_col not in df.columns or y_col not in df.columns:
         print(f"[WARNING] Cannot create heatmap: missing columns {x_col} or {y_col}")
         return
-    
+
     x = df[x_col].to_numpy()
     y = df[y_col].to_numpy()
-    
+
     if len(x) == 0:
         print("[WARNING] Cannot create heatmap: no placement data")
         return
-    
+
     # 2D histogram over the placement area
-    H, x_edges, y_edges = np.histogram2d(x, y, bins=bins)
-    
-    fig, ax = plt.subplots(figsize=figsize)
-    im = ax.imshow(
-        H.T,
-        origin="lower",
-        extent=[x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]],
-        aspect="equal",
-        cmap=cmap,
-        interpolation='nearest',
-    )
-    
-    ax.set_xlabel(f"{x_col} (μm)", fontsize=12)
-    ax.set_ylabel(f"{y_col} (μm)", fontsize=12)
-    
+    H, x_edges, y_edges = _histogram2d_bincount(x, y, bins)
+
+    # Colormap the density grid: row 0 of the image is the top, so flip to
+    # keep the origin in the lower-left corner like the placement coordinates
+    h_max = H.max()
+    norm = (H.T[::-1] * (255.0 / h_max)).astype(np.uint8) if h_max > 0 else np.zeros(H.T.shape, dtype=np.uint8)
+    rgba = _colormap_lut(cmap)[norm]
+
+    # Scale up with nearest-neighbour sampling, keeping the data aspect ratio
+    span_x = float(x_edges[-1] - x_edges[0]) or 1.0
+    span_y = float(y_edges[-1] - y_edges[0]) or 1.0
+    width_px = max(int(figsize[0] * 100), 1)
+    height_px = max(int(round(width_px * span_y / span_x)), 1)
+    img = Image.fromarray(rgba, "RGBA").resize((width_px, height_px), Image.NEAREST)
+
     # Generate title if not provided
     if title is None:
         title = f"Placement Density Heatmap - {data_source_name} ({len(df)} cells)"
-    ax.set_title(title, fontsize=14, fontweight='bold')
-    
-    cbar = fig.colorbar(im, ax=ax, label="Cell count per bin")
-    cbar.ax.tick_params(labelsize=10)
-    
-    # Add grid for better readability
-    ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.5)
-    
+
+    # Title banner and count scale along the top edge
+    banner_px = 24
+    canvas = Image.new("RGBA", (width_px, height_px + banner_px), (255, 255, 255, 255))
+    canvas.paste(img, (0, banner_px))
+    draw = ImageDraw.Draw(canvas)
+    draw.text((4, 6), f"{title}  [max {int(h_max)} cells/bin]", fill=(0, 0, 0, 255))
+
     if output_path is not None:
         output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        fig.savefig(output_path, dpi=200, bbox_inches="tight")
-        plt.close(fig)
+        canvas.save(output_path, optimize=False)
         print(f"[DEBUG] Saved placement heatmap to: {output_path}")
     else:
-        plt.show()
+        canvas.show()
 
 
 if __name__ == "__main__":
@@ -1,89 +1,171 @@
 import argparse
-import csv
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
-import math
 import numpy as np
+import pandas as pd
+import matplotlib
+# Headless savefig-only script: skip GUI backend autodetection
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
+# Merge near-collinear segments more aggressively when rendering dense traces
+plt.rcParams['path.simplify'] = True
+plt.rcParams['path.simplify_threshold'] = 1.0
 
-def _read_csv(path: str) -> List[Dict[str, Any]]:
-    rows = []
-    with open(path, newline="") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            rows.append(r)
-    return rows
 
+# Columns each plot reads; everything else in the log is never parsed
+FULL_COLUMNS = ['episode', 'loss', 'policy_loss', 'value_loss', 'entropy', 'hpwl_end']
+SWAP_COLUMNS = ['episode', 'loss', 'hpwl_local_end']
 
-def _to_float(v: Any, default: float = math.nan) -> float:
-    try:
-        return float(v)
-    except Exception:
-        return default
+# Rows parsed per chunk when streaming a training log
+CSV_CHUNK_ROWS = 200_000
+
+
+def _read_csv(path: str, kind: str, columns: list) -> pd.DataFrame:
+    """Load the plotted ``columns`` of a PPO training log for rows of ``kind``.
+
+    The log is streamed in chunks with metrics parsed as float32, and the
+    ``kind`` filter is applied per chunk so peak memory stays near the size
+    of the kept rows. Logs written before the ``kind`` column existed (or
+    with no matching rows) are returned unfiltered for backward compatibility.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    has_kind = 'kind' in header
+    usecols = [c for c in columns if c in header] + (['kind'] if has_kind else [])
+    dtype = {c: np.float32 for c in usecols if c not in ('episode', 'kind')}
+
+    def _load(filter_kind: bool) -> pd.DataFrame:
+        chunks = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=CSV_CHUNK_ROWS)
+        if filter_kind:
+            chunks = (chunk[chunk['kind'] == kind] for chunk in chunks)
+        return pd.concat(chunks, ignore_index=True)
+
+    if has_kind:
+        df = _load(True)
+        if not df.empty:
+            return df
+    return _load(False)
+
+
+def _column(df: pd.DataFrame, name: str) -> np.ndarray:
+    """Return a log column as float64, with unparsable entries as NaN."""
+    return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=np.float64)
 
 
 def moving_average(x: np.ndarray, window: int) -> np.ndarray:
     if window <= 1 or window > len(x):
         return x
-    cumsum = np.cumsum(np.insert(x, 0, 0.0))
-    return (cumsum[window:] - cumsum[:-window]) / window
-
-
-def plot_full(csv_rows: List[Dict[str, Any]], out_prefix: Path, ma: int):
-    eps = np.array([int(r['episode']) for r in csv_rows])
-    loss = np.array([_to_float(r['loss']) for r in csv_rows])
-    pl = np.array([_to_float(r['policy_loss']) for r in csv_rows])
-    vl = np.array([_to_float(r['value_loss']) for r in csv_rows])
-    ent = np.array([_to_float(r['entropy']) for r in csv_rows])
-    hpwl = np.array([_to_float(r['hpwl_end']) for r in csv_rows])
+    # Prefix sums in float64, written in place after a leading zero
+    cumsum = np.empty(len(x) + 1, dtype=np.float64)
+    cumsum[0] = 0.0
+    np.cumsum(x, out=cumsum[1:])
+    out = np.subtract(cumsum[window:], cumsum[:-window])
+    out /= window
+    return out
+
+
+# Raw per-episode traces longer than this are LTTB-downsampled before plotting
+LTTB_POINTS = 5000
+
+
+def _lttb(x: np.ndarray, y: np.ndarray, n_out: int = LTTB_POINTS):
+    """Largest-Triangle-Three-Buckets downsampling of a line series.
+
+    Keeps the first and last points and, from each of ``n_out - 2`` equal
+    buckets, the point forming the largest triangle with the previously kept
+    point and the mean of the next bucket. Series that are already short
+    enough are returned unchanged. NaN points are only kept when a bucket has
+    nothing else, so gaps in sparse metrics survive without dominating.
+    """
+    n = len(x)
+    if n_out < 3 or n <= n_out:
+        return x, y
+    xf = np.asarray(x, dtype=np.float64)
+    yf = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt_y = yf[hi:edges[i + 2]]
+            finite = np.isfinite(nxt_y)
+            cx = xf[hi:edges[i + 2]].mean()
+            cy = nxt_y[finite].mean() if finite.any() else yf[a]
+        else:
+            cx, cy = xf[-1], yf[-1]
+        area = np.abs((xf[a] - cx) * (yf[lo:hi] - yf[a]) - (xf[a] - xf[lo:hi]) * (cy - yf[a]))
+        area[np.isnan(area)] = -1.0
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def plot_full(df: pd.DataFrame, out_prefix: Path, ma: int):
+    eps = df['episode'].to_numpy(dtype=np.int64)
+    loss = _column(df, 'loss')
+    pl = _column(df, 'policy_loss')
+    vl = _column(df, 'value_loss')
+    ent = _column(df, 'entropy')
+    hpwl = _column(df, 'hpwl_end')
 
     fig, ax = plt.subplots(2, 2, figsize=(10, 7))
-    ax[0,0].plot(eps, loss, label='loss', alpha=0.4)
+    ax[0,0].plot(*_lttb(eps, loss), label='loss', alpha=0.4)
     ax[0,0].plot(eps[ma-1:], moving_average(loss, ma), label=f'loss(ma{ma})')
     ax[0,0].set_title('Full Placer Loss'); ax[0,0].legend(); ax[0,0].grid(True, alpha=0.3)
 
-    ax[0,1].plot(eps, pl, label='policy', alpha=0.5)
-    ax[0,1].plot(eps, vl, label='value', alpha=0.5)
-    ax[0,1].plot(eps, ent, label='entropy', alpha=0.5)
+    ax[0,1].plot(*_lttb(eps, pl), label='policy', alpha=0.5)
+    ax[0,1].plot(*_lttb(eps, vl), label='value', alpha=0.5)
+    ax[0,1].plot(*_lttb(eps, ent), label='entropy', alpha=0.5)
     ax[0,1].set_title('Components'); ax[0,1].legend(); ax[0,1].grid(True, alpha=0.3)
 
-    ax[1,0].plot(eps, hpwl, label='hpwl')
+    ax[1,0].plot(*_lttb(eps, hpwl), label='hpwl')
     if len(hpwl) >= ma:
         ax[1,0].plot(eps[ma-1:], moving_average(hpwl, ma), label=f'hpwl(ma{ma})')
     ax[1,0].set_title('Episode End HPWL (subset)'); ax[1,0].legend(); ax[1,0].grid(True, alpha=0.3)
 
-    ax[1,1].plot(eps, ent, label='entropy', color='darkorange')
+    ax[1,1].plot(*_lttb(eps, ent), label='entropy', color='darkorange')
     ax[1,1].set_title('Entropy'); ax[1,1].legend(); ax[1,1].grid(True, alpha=0.3)
 
     fig.tight_layout()
     out_file = out_prefix.with_suffix('.full.png')
-    fig.savefig(out_file, dpi=140)
+    fig.savefig(out_file, dpi=140, pil_kwargs={'optimize': True})
     print(f'Saved full placer plot: {out_file}')
 
 
-def plot_swap(csv_rows: List[Dict[str, Any]], out_prefix: Path, ma: int):
-    eps = np.array([int(r['episode']) for r in csv_rows])
-    loss = np.array([_to_float(r['loss']) for r in csv_rows])
-    hpwl = np.array([_to_float(r['hpwl_local_end']) for r in csv_rows])
+def plot_swap(df: pd.DataFrame, out_prefix: Path, ma: int):
+    eps = df['episode'].to_numpy(dtype=np.int64)
+    loss = _column(df, 'loss')
+    hpwl = _column(df, 'hpwl_local_end')
 
     fig, ax = plt.subplots(1, 2, figsize=(10, 4))
-    ax[0].plot(eps, loss, label='loss', alpha=0.4)
+    ax[0].plot(*_lttb(eps, loss), label='loss', alpha=0.4)
     if len(loss) >= ma:
         ax[0].plot(eps[ma-1:], moving_average(loss, ma), label=f'loss(ma{ma})')
     ax[0].set_title('Swap Refiner Loss'); ax[0].legend(); ax[0].grid(True, alpha=0.3)
 
-    ax[1].plot(eps, hpwl, label='local hpwl', alpha=0.7)
+    ax[1].plot(*_lttb(eps, hpwl), label='local hpwl', alpha=0.7)
     if len(hpwl) >= ma:
         ax[1].plot(eps[ma-1:], moving_average(hpwl, ma), label=f'hpwl(ma{ma})')
     ax[1].set_title('Local HPWL (touched nets)'); ax[1].legend(); ax[1].grid(True, alpha=0.3)
 
     fig.tight_layout()
     out_file = out_prefix.with_suffix('.swap.png')
-    fig.savefig(out_file, dpi=140)
+    fig.savefig(out_file, dpi=140, pil_kwargs={'optimize': True})
     print(f'Saved swap refiner plot: {out_file}')
 
 
+def _plot_full_log(csv_path: str, out_prefix: Path, ma: int):
+    """Process-pool worker: load the full placer log and plot it."""
+    plot_full(_read_csv(csv_path, 'full', FULL_COLUMNS), out_prefix, ma)
+
+
+def _plot_swap_log(csv_path: str, out_prefix: Path, ma: int):
+    """Process-pool worker: load the swap refiner log and plot it."""
+    plot_swap(_read_csv(csv_path, 'swap', SWAP_COLUMNS), out_prefix, ma)
+
+
 def main():
     ap = argparse.ArgumentParser(description='Plot PPO training metrics for RL placer.')
     ap.add_argument('--full-log-csv', default=None, help='CSV produced by full placer PPO')
@@ -95,20 +177,28 @@ def main():
     out_prefix = Path(args.out_prefix)
     out_prefix.parent.mkdir(parents=True, exist_ok=True)
 
+    jobs = []
     if args.full_log_csv and Path(args.full_log_csv).exists():
-        rows = _read_csv(args.full_log_csv)
-        rows_full = [r for r in rows if r.get('kind') == 'full'] or rows  # backward compatibility
-        plot_full(rows_full, out_prefix, args.ma_window)
+        jobs.append((_plot_full_log, args.full_log_csv))
     else:
         print('Full log CSV not provided or missing; skipping full plot.')
 
     if args.swap_log_csv and Path(args.swap_log_csv).exists():
-        rows = _read_csv(args.swap_log_csv)
-        rows_swap = [r for r in rows if r.get('kind') == 'swap'] or rows
-        plot_swap(rows_swap, out_prefix, args.ma_window)
+        jobs.append((_plot_swap_log, args.swap_log_csv))
     else:
         print('Swap log CSV not provided or missing; skipping swap plot.')
 
+    if len(jobs) == 1:
+        fn, csv_path = jobs[0]
+        fn(csv_path, out_prefix, args.ma_window)
+    elif jobs:
+        # Each worker parses its own CSV and renders independently, so only
+        # the file paths cross the process boundary
+        with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = [executor.submit(fn, csv_path, out_prefix, args.ma_window) for fn, csv_path in jobs]
+            for future in futures:
+                future.result()
+
 
 if __name__ == '__main__':
     main()
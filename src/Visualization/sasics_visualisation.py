@@ -7,37 +7,57 @@ Visualize the Structured ASIC layout:
 Run:
   python -m src.Visualization.sasics_visualisation
 """
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go # type: ignore[reportMissingTypeStubs]
 
-from typing import Dict, Set, Any, List, Optional
+from typing import Dict, Set, List, Tuple
 from src.parsers.fabric_db import get_fabric_db, Fabric
 from src.parsers.pins_parser import load_and_validate as load_pins_df, PinsMeta
 
 fig : go.Figure = go.Figure()
 
 
-def classify_cell(cell_type: str) -> str:
-    s = cell_type.lower()
-    if "nand" in s:
-        return "logic_nand"
-    if "or" in s:
-        return "logic_or"
-    if "inv" in s:
-        return "inv"
-    if "buf" in s:
-        return "clock_buf"
-    if "dfbbp" in s:
-        return "flop"
-    if "tap" in s:
-        return "tap"
-    if "decap" in s:
-        return "decap"
-    if "conb" in s:
-        return "tie"
-    if "fill" in s:
-        return "fill"
-    return "other"
+# (class, substring) pairs in priority order: the first substring found in the
+# lower-cased cell name decides the class
+_CELL_CLASS_TOKENS: List[Tuple[str, str]] = [
+    ("logic_nand", "nand"),
+    ("logic_or", "or"),
+    ("inv", "inv"),
+    ("clock_buf", "buf"),
+    ("flop", "dfbbp"),
+    ("tap", "tap"),
+    ("decap", "decap"),
+    ("tie", "conb"),
+    ("fill", "fill"),
+]
+# Indexed by token position; the extra trailing entry is the no-match class
+_CELL_CLASS_NAMES = np.array([cls for cls, _ in _CELL_CLASS_TOKENS] + ["other"])
+
+
+def classify_cells(cell_names: pd.Series) -> pd.Series:
+    """Classify a column of cell names for coloring.
+
+    A name gets the class of the first token in ``_CELL_CLASS_TOKENS`` it
+    contains (case-insensitive), in priority order: "nand" -> logic_nand,
+    "or" -> logic_or, "inv" -> inv, "buf" -> clock_buf, "dfbbp" -> flop,
+    "tap" -> tap, "decap" -> decap, "conb" -> tie, "fill" -> fill, and
+    "other" when none match.
+
+    Fabric cell names are tile-relative templates that repeat across every
+    tile, so the token tests run over the unique names only: one substring
+    sweep per token builds a (names x tokens) boolean matrix, and argmax
+    picks the first matching token by priority. The result is broadcast
+    back through the factorized codes.
+    """
+    codes, uniques = pd.factorize(cell_names.astype(str))
+    lower = pd.Series(uniques, dtype=object).str.lower()
+    mask = np.stack(
+        [lower.str.contains(tok, regex=False).to_numpy(dtype=bool) for _, tok in _CELL_CLASS_TOKENS],
+        axis=1,
+    )
+    class_idx = np.where(mask.any(axis=1), mask.argmax(axis=1), len(_CELL_CLASS_TOKENS))
+    return pd.Series(_CELL_CLASS_NAMES[class_idx][codes], index=cell_names.index)
 
 
 CELL_TYPE_COLORS: Dict[str, str] = {
@@ -60,202 +80,130 @@ PIN_LAYER_COLORS: Dict[str, str] = {
     "met3 OUTPUT": "#1D9494",  # teal
 }
 
+def _rect_strip(*corners: np.ndarray) -> np.ndarray:
+    """Interleave per-rectangle corner coordinates into one NaN-separated strip.
+
+    Writes ``corners[0][i], ..., corners[-1][i], NaN`` for each rectangle ``i``
+    with one strided store per corner into a single preallocated buffer.
+    """
+    stride = len(corners) + 1
+    out = np.empty(stride * len(corners[0]), dtype=np.float64)
+    for k, col in enumerate(corners):
+        out[k::stride] = col
+    out[stride - 1::stride] = np.nan
+    return out
+
+
 def draw_cells(
     fabric_dict: Fabric,
     fabric_df: pd.DataFrame,
     pins_meta: PinsMeta,
     pins_df: pd.DataFrame,
     decimals: int = 3,
-    fast_mode: Optional[bool] = None,
-    fast_threshold: int = 8000,
 ) -> None:
     """Render the scene with faster batching and cleaner numbers.
 
-    - Batches all rectangle shapes and sets them via a single layout update.
-    - Uses itertuples() and rounds coordinates to reduce FP artifacts.
+    - Draws cells as one WebGL line-strip trace per cell class.
+    - Builds coordinates with NumPy and rounds them to reduce FP artifacts.
     - Avoids per-item prints that slow down rendering.
     """
     site_width_um: float = float(fabric_dict.fabric_info["site_dimensions_um"]["width"])    
     site_height_um: float = float(fabric_dict.fabric_info["site_dimensions_um"]["height"])    
 
-    # Accumulate shapes and update once (significantly faster than add_shape in a loop)
-    shapes: List[Dict[str, Any]] = []
-
-    # Die outline as a shape
-    shapes.append({
-        "type": "rect",
-        "x0": 0,
-        "y0": 0,
-        "x1": pins_meta.die.width_um,
-        "y1": pins_meta.die.height_um,
-        "line": dict(color="Black", width=3),
-        "fillcolor": None,
-    })
-    # Legend entry for die outline (trace-only, shapes don't show in legends)
+    # Die and core outlines are drawn as real line traces so they carry their
+    # own legend entries (no layout shapes mirrored by legend-only dummies)
+    die_w: float = pins_meta.die.width_um
+    die_h: float = pins_meta.die.height_um
+    core_x0: float = pins_meta.die.core_margin_um
+    core_y0: float = pins_meta.die.core_margin_um
+    core_x1: float = pins_meta.core.width_um + pins_meta.die.core_margin_um
+    core_y1: float = pins_meta.core.height_um + pins_meta.die.core_margin_um
+
     fig.add_trace(go.Scatter(  # type: ignore[reportUnknownMemberType]
-        x=[0, pins_meta.die.width_um, pins_meta.die.width_um, 0, 0],
-        y=[0, 0, pins_meta.die.height_um, pins_meta.die.height_um, 0],
+        x=[0, die_w, die_w, 0, 0],
+        y=[0, 0, die_h, die_h, 0],
         mode="lines",
         line=dict(color="Black", width=3),
         name="Die Outline",
-        visible="legendonly",
+        hoverinfo="skip",
         showlegend=True,
     ))
-
-    # Core outline as a shape
-    shapes.append({
-        "type": "rect",
-        "x0": pins_meta.die.core_margin_um,
-        "y0": pins_meta.die.core_margin_um,
-        "x1": pins_meta.core.width_um + pins_meta.die.core_margin_um,
-        "y1": pins_meta.core.height_um + pins_meta.die.core_margin_um,
-        "line": dict(color="Blue", width=3),
-        "fillcolor": None,
-    })
-    # Legend entry for core outline (trace-only)
     fig.add_trace(go.Scatter(  # type: ignore[reportUnknownMemberType]
-        x=[
-            pins_meta.die.core_margin_um,
-            pins_meta.core.width_um + pins_meta.die.core_margin_um,
-            pins_meta.core.width_um + pins_meta.die.core_margin_um,
-            pins_meta.die.core_margin_um,
-            pins_meta.die.core_margin_um,
-        ],
-        y=[
-            pins_meta.die.core_margin_um,
-            pins_meta.die.core_margin_um,
-            pins_meta.core.height_um + pins_meta.die.core_margin_um,
-            pins_meta.core.height_um + pins_meta.die.core_margin_um,
-            pins_meta.die.core_margin_um,
-        ],
+        x=[core_x0, core_x1, core_x1, core_x0, core_x0],
+        y=[core_y0, core_y0, core_y1, core_y1, core_y0],
         mode="lines",
         line=dict(color="Blue", width=3),
         name="Core Outline",
-        visible="legendonly",
+        hoverinfo="skip",
         showlegend=True,
     ))
     print("Die and Core prepared.")
 
-    # Choose rendering path based on number of cells
+    # Cells are always rendered as one WebGL line-strip trace per class; SVG
+    # shapes (one DOM node per cell) do not scale to fabric-sized layouts.
     num_cells: int = int(fabric_df.shape[0])
-    use_fast: bool = fast_mode if fast_mode is not None else (num_cells > fast_threshold)
-
-    if use_fast:
-        print(f"Fast mode enabled for {num_cells} cells (threshold {fast_threshold}). Rendering outlines via WebGL lines.")
-        # Build per-class line strips with None separators for each rectangle
-        # Allow None separators in coordinate lists; annotate as List[Any]
-        class_coords: Dict[str, Dict[str, List[Any]]] = {}
-
-        used_cell_classes: Set[str] = set()
-        for row in fabric_df.itertuples(index=False):
-            cell_name = str(getattr(row, "cell_name"))
-            cell_class = classify_cell(cell_name)
-            used_cell_classes.add(cell_class)
-
-            x_raw = float(getattr(row, "cell_x"))
-            y_raw = float(getattr(row, "cell_y"))
-            width_sites = int(getattr(row, "width_sites"))
-
-            x0 = round(x_raw, decimals)
-            y0 = round(y_raw, decimals)
-            x1 = round(x0 + width_sites * site_width_um, decimals)
-            y1 = round(y0 + site_height_um, decimals)
-
-            entry = class_coords.setdefault(cell_class, {"x": [], "y": []})
-            entry["x"].extend([x0, x1, x1, x0, x0, None])  # None breaks the polygon for separate rectangles
-            entry["y"].extend([y0, y0, y1, y1, y0, None])
-
-        # Add one WebGL line trace per class
-        for cls in sorted(used_cell_classes):
-            coords = class_coords.get(cls)
-            if not coords:
-                continue
-            fig.add_trace(  # type: ignore[reportUnknownMemberType]
-                go.Scattergl(
-                x=coords["x"],
-                y=coords["y"],
-                mode="lines",
-                line=dict(color=CELL_TYPE_COLORS.get(cls, "#000000"), width=1),
-                name=f"Cell: {cls}",
-                showlegend=True,
-                fill="toself",
-                fillcolor=CELL_TYPE_COLORS.get(cls, "#000000"),
-                opacity=0.6,
-            ))
-        print(f"Cell outlines added as WebGL lines for {len(used_cell_classes)} classes.")
-        # Apply only die/core shapes
-        fig.update_layout(shapes=shapes)  # type: ignore[reportUnknownMemberType]
-    else:
-        i: int = 0
-        used_cell_classes: Set[str] = set()
-        for row in fabric_df.itertuples(index=False):
-            cell_name = str(getattr(row, "cell_name"))
-            cell_class = classify_cell(cell_name)
-            cell_color = CELL_TYPE_COLORS.get(cell_class, "#000000")
-            used_cell_classes.add(cell_class)
-
-            x_raw = float(getattr(row, "cell_x"))
-            y_raw = float(getattr(row, "cell_y"))
-            width_sites = int(getattr(row, "width_sites"))
-
-            cell_x_um = round(x_raw, decimals)
-            cell_y_um = round(y_raw, decimals)
-            cell_width_um = round(width_sites * site_width_um, decimals)
-            cell_height_um = round(site_height_um, decimals)
-
-            shapes.append({
-                "type": "rect",
-                "x0": cell_x_um,
-                "y0": cell_y_um,
-                "x1": cell_x_um + cell_width_um,
-                "y1": cell_y_um + cell_height_um,
-                "line": dict(color="Black", width=1),
-                "fillcolor": cell_color,
-                "opacity": 0.7,
-            })
-            i += 1
-            if i % 1000 == 0:
-                print(f"Prepared {i} cell rectangles...")
-
-        # Apply all shapes at once
-        fig.update_layout(shapes=shapes)  # type: ignore[reportUnknownMemberType]
-        print(f"Cells prepared: {i} total; classes: {len(used_cell_classes)}")
-
-        # Legend entries for cell classes (shapes don't appear in legends)
-        for cls in sorted(used_cell_classes):
-            fig.add_trace(  # type: ignore[reportUnknownMemberType]
-                go.Scatter(
-                x=[0],
-                y=[0],
-                mode="markers",
-                marker=dict(size=10, color=CELL_TYPE_COLORS.get(cls, "#000000")),
-                name=f"Cell: {cls}",
-                visible="legendonly",
-                showlegend=True,
-            ))
+    cell_classes: pd.Series = classify_cells(fabric_df["cell_name"])
+    print(f"Rendering {num_cells} cell outlines via WebGL lines.")
+
+    # Build per-class line strips: each rectangle is 5 corner points plus a
+    # NaN separator that breaks the polygon
+    x0 = fabric_df["cell_x"].to_numpy(dtype=np.float64).round(decimals)
+    y0 = fabric_df["cell_y"].to_numpy(dtype=np.float64).round(decimals)
+    x1 = (x0 + fabric_df["width_sites"].to_numpy(dtype=np.int64) * site_width_um).round(decimals)
+    y1 = (y0 + site_height_um).round(decimals)
+
+    class_coords: Dict[str, Dict[str, np.ndarray]] = {
+        cls: {
+            "x": _rect_strip(x0[idx], x1[idx], x1[idx], x0[idx], x0[idx]),
+            "y": _rect_strip(y0[idx], y0[idx], y1[idx], y1[idx], y0[idx]),
+        }
+        for cls, idx in cell_classes.groupby(cell_classes).indices.items()
+    }
+    used_cell_classes: Set[str] = set(class_coords)
+
+    # Add one WebGL line trace per class
+    for cls in sorted(used_cell_classes):
+        coords = class_coords[cls]
+        fig.add_trace(  # type: ignore[reportUnknownMemberType]
+            go.Scattergl(
+            x=coords["x"],
+            y=coords["y"],
+            mode="lines",
+            line=dict(color=CELL_TYPE_COLORS.get(cls, "#000000"), width=1),
+            name=f"Cell: {cls}",
+            showlegend=True,
+            fill="toself",
+            fillcolor=CELL_TYPE_COLORS.get(cls, "#000000"),
+            opacity=0.6,
+        ))
+    print(f"Cell outlines added as WebGL lines for {len(used_cell_classes)} classes.")
 
     #Draw Pins (grouped by Layer + Direction for clean legends)
-    pins_df = pins_df.copy()
-    pins_df["_category"] = pins_df["layer"].astype(str) + " " + pins_df["direction"].astype(str)
+    # Group in place (no copy / concatenated key column); sort=False keeps
+    # first-appearance order for categories not listed in PIN_LAYER_COLORS.
+    # Only row positions are kept per group; the columns are pulled out once.
+    pin_groups: Dict[str, np.ndarray] = {
+        f"{layer} {direction}": idx
+        for (layer, direction), idx in pins_df.groupby(["layer", "direction"], sort=False, dropna=False).indices.items()
+    }
+    pin_x = pins_df["x_um"].to_numpy()
+    pin_y = pins_df["y_um"].to_numpy()
+    pin_names = pins_df["name"].to_numpy(dtype=object)
     # Prefer legend order based on PIN_LAYER_COLORS mapping keys if present
-    categories_in_data = list(dict.fromkeys(pins_df["_category"].tolist()))
-    ordered_categories = [c for c in PIN_LAYER_COLORS.keys() if c in categories_in_data]
-    ordered_categories += [c for c in categories_in_data if c not in ordered_categories]
+    ordered_categories = [c for c in PIN_LAYER_COLORS.keys() if c in pin_groups]
+    ordered_categories += [c for c in pin_groups if c not in ordered_categories]
 
     for cat in ordered_categories:
-        grp = pins_df[pins_df["_category"] == cat]
+        idx = pin_groups[cat]
         fig.add_trace(  # type: ignore[reportUnknownMemberType]
             go.Scatter(
-            x=grp["x_um"].tolist(),
-            y=grp["y_um"].tolist(),
+            x=pin_x[idx],
+            y=pin_y[idx],
             mode="markers",
-            marker=dict(
-                size=5,
-                color=PIN_LAYER_COLORS.get(cat, "#000000"),
-                line=dict(width=0),
-            ),
+            marker=dict(size=5, color=PIN_LAYER_COLORS.get(cat, "#000000")),
+            marker_line_width=0,
             name=cat,
-            hovertext=grp["name"].tolist(),
+            hovertext=pin_names[idx],
             hovertemplate="Pin: %{hovertext}<br>Category: " + cat + "<br>(%{x:.2f}, %{y:.2f})<extra></extra>",
             showlegend=True,
         ))
@@ -263,6 +211,22 @@ def draw_cells(
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Structured ASIC layout visualization.")
+    parser.add_argument(
+        "--format",
+        choices=["html", "png", "svg"],
+        default="html",
+        help="Output format; png/svg write a static snapshot via Kaleido (default: html)",
+    )
+    parser.add_argument(
+        "--no-open",
+        action="store_true",
+        help="Do not open the HTML output in a browser (batch/CI runs)",
+    )
+    args = parser.parse_args()
+
     fabric_file_path = "inputs/Platform/fabric.yaml"
     fabric_cells_file_path = "inputs/Platform/fabric_cells.yaml"
     pins_file_path = "inputs/Platform/pins.yaml"
@@ -270,30 +234,42 @@ if __name__ == "__main__":
     fabric_dict, fabric_df = get_fabric_db(fabric_file_path, fabric_cells_file_path)
     pins_df, pins_meta = load_pins_df(pins_file_path)
 
-    draw_cells(fabric_dict, fabric_df, pins_meta, pins_df)
-
-    fig.update_layout(  # type: ignore[reportUnknownMemberType]
-        title="Structured ASIC Layout Visualization",
-        xaxis_title="Width (um)",
-        yaxis_title="Height (um)",
-        yaxis=dict(
-            scaleanchor="x",
-            scaleratio=1,
-            showgrid=False,
-            zeroline=False,
-        ),
-        xaxis=dict(
-            showgrid=False,
-            zeroline=False,
-        ),
-        plot_bgcolor="white",
-    )
-
-    # Write to HTML and open in the default browser. Using CDN keeps the file lighter for large designs.
-    fig.write_html(  # type: ignore[reportUnknownMemberType]
-        "build/structured_asic_layout.html",
-        auto_open=True,
-        include_plotlyjs="cdn",
-        full_html=True,
-    )
-    
\ No newline at end of file
+    # Defer relayout/validation bookkeeping until every trace and the layout are in place
+    with fig.batch_update():
+        draw_cells(fabric_dict, fabric_df, pins_meta, pins_df)
+
+        fig.update_layout(  # type: ignore[reportUnknownMemberType]
+            title="Structured ASIC Layout Visualization",
+            xaxis_title="Width (um)",
+            yaxis_title="Height (um)",
+            yaxis=dict(
+                scaleanchor="x",
+                scaleratio=1,
+                showgrid=False,
+                zeroline=False,
+            ),
+            xaxis=dict(
+                showgrid=False,
+                zeroline=False,
+            ),
+            plot_bgcolor="white",
+        )
+
+    if args.format == "html":
+        # Write to HTML and open in the default browser. Using CDN keeps the file lighter
+        # for large designs; the traces were built here, so skip re-validating the payload.
+        fig.write_html(  # type: ignore[reportUnknownMemberType]
+            "build/structured_asic_layout.html",
+            auto_open=not args.no_open,
+            include_plotlyjs="cdn",
+            full_html=True,
+            validate=False,
+        )
+    else:
+        # Static snapshot via Kaleido for headless runs: no browser-side layout at all
+        fig.write_image(  # type: ignore[reportUnknownMemberType]
+            f"build/structured_asic_layout.{args.format}",
+            width=1600,
+            height=1600,
+            validate=False,
+        )
@@ -2,16 +2,31 @@
 htree_builder.py: Generates ECO netlist with H-tree Clock Tree Synthesis (CTS).
 """
 
+import io
 import json
 import math
 import sys
 from pathlib import Path
-from typing import Dict, List, Tuple, Set, Optional, Any
+from typing import Dict, List, Tuple, Set, Optional, Any, TextIO
 from dataclasses import dataclass, field
 
 import pandas as pd
 import numpy as np
 
+# Optional: fused kernels for the H-tree partition and nearest-buffer search
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Optional: faster JSON for the CTS visualization dump and leakage-vector load
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Add project root to sys.path so `import src.*` works when running as a script
 project_root_for_imports = Path(__file__).resolve().parent.parent.parent
 sys.path.append(str(project_root_for_imports))
@@ -22,6 +37,9 @@ from src.parsers.netlist_parser import NetlistParser
 from src.placement.placement_mapper import map_placement_to_physical_cells
 from src.parsers.pins_parser import load_and_validate as load_pins_df
 
+# Port-name suffixes of active-low inputs (tied HIGH when a cell is powered down)
+ACTIVE_LOW_SUFFIXES = ('_B', '_N')
+
 def parse_map_file(map_file_path: str) -> pd.DataFrame:
     """
     Parse a .map file to get logical to physical cell name mappings.
@@ -55,7 +73,164 @@ def parse_map_file(map_file_path: str) -> pd.DataFrame:
     
     return pd.DataFrame(mappings)
 
-@dataclass
+def dff_type_mask(cell_types: pd.Series) -> pd.Series:
+    """
+    Boolean mask of flip-flop cell types (``'df'`` in the lower-cased type name).
+    
+    The substring test runs once per distinct type and the rows are matched
+    with a set lookup; missing types count as non-DFF.
+    """
+    dff_types = [t for t in cell_types.dropna().unique() if 'df' in t.lower()]
+    return cell_types.isin(dff_types)
+
+def nearest_point_indices(query_x: np.ndarray, query_y: np.ndarray,
+                          point_x: np.ndarray, point_y: np.ndarray,
+                          chunk_size: int = 512) -> np.ndarray:
+    """
+    Batched nearest-neighbour query (Euclidean) of query points against a fixed point set.
+    
+    Distances are evaluated with NumPy broadcasting over blocks of ``chunk_size``
+    queries, so peak memory stays at ``chunk_size * len(points)`` floats. Ties are
+    broken towards the lowest point index, like a sequential strict ``<`` scan.
+    
+    Args:
+        query_x, query_y: Coordinates of the query points
+        point_x, point_y: Coordinates of the candidate points (must be non-empty)
+        chunk_size: Number of queries evaluated per block
+    
+    Returns:
+        Array with the index of the nearest candidate point for every query
+    """
+    query_x = np.asarray(query_x, dtype=np.float64)
+    query_y = np.asarray(query_y, dtype=np.float64)
+    point_x = np.asarray(point_x, dtype=np.float64)
+    point_y = np.asarray(point_y, dtype=np.float64)
+    
+    nearest = np.empty(len(query_x), dtype=np.intp)
+    for start in range(0, len(query_x), chunk_size):
+        stop = start + chunk_size
+        dx = query_x[start:stop, None] - point_x[None, :]
+        dy = query_y[start:stop, None] - point_y[None, :]
+        dx *= dx
+        dy *= dy
+        dx += dy
+        # sqrt keeps ties identical to the scalar (dx**2 + dy**2)**0.5 comparison
+        np.sqrt(dx, out=dx)
+        nearest[start:stop] = dx.argmin(axis=1)
+    return nearest
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _nearest_available_l1(px, py, available, target_x, target_y):
+        # Single fused scan; float32 like the NumPy path, first index wins ties
+        tx = np.float32(target_x)
+        ty = np.float32(target_y)
+        best = np.float32(np.inf)
+        best_idx = -1
+        for i in range(px.shape[0]):
+            if not available[i]:
+                continue
+            d = abs(px[i] - tx) + abs(py[i] - ty)
+            if d < best:
+                best = d
+                best_idx = i
+        return best_idx
+
+    @njit(cache=True)
+    def _quadrant_split_jit(xs, ys):
+        # One pass for the bounding box, one pass for the quadrant ids
+        min_x = max_x = xs[0]
+        min_y = max_y = ys[0]
+        for i in range(1, xs.shape[0]):
+            if xs[i] < min_x:
+                min_x = xs[i]
+            elif xs[i] > max_x:
+                max_x = xs[i]
+            if ys[i] < min_y:
+                min_y = ys[i]
+            elif ys[i] > max_y:
+                max_y = ys[i]
+        center_x = (min_x + max_x) / 2
+        center_y = (min_y + max_y) / 2
+        qid = np.empty(xs.shape[0], dtype=np.int8)
+        for i in range(xs.shape[0]):
+            qid[i] = (xs[i] <= center_x) + 2 * (ys[i] <= center_y)
+        return center_x, center_y, qid
+
+def quadrant_split(xs: np.ndarray, ys: np.ndarray) -> Tuple[float, float, np.ndarray]:
+    """
+    Bounding-box center and H-tree quadrant id of every point.
+    
+    Quadrant ids are NE=0, NW=1, SE=2, SW=3 around the center of the bounding
+    box, with points on a center line assigned to the W / S side.
+    
+    Args:
+        xs, ys: float64 coordinates of the points (must be non-empty)
+    
+    Returns:
+        (center_x, center_y, qid)
+    """
+    if NUMBA_AVAILABLE:
+        center_x, center_y, qid = _quadrant_split_jit(xs, ys)
+        return float(center_x), float(center_y), qid
+    center_x = (float(xs.min()) + float(xs.max())) / 2
+    center_y = (float(ys.min()) + float(ys.max())) / 2
+    qid = (xs <= center_x) + 2 * (ys <= center_y)
+    return center_x, center_y, qid
+
+def htree_partition(xs: np.ndarray, ys: np.ndarray, idx: np.ndarray) -> Tuple[float, float, List[np.ndarray]]:
+    """
+    Split one H-tree group into its non-empty quadrants.
+    
+    Quadrants come in NE, NW, SE, SW order and keep the input order of their
+    points. When every point lands in one quadrant (all sinks coincident, e.g.
+    unplaced cells defaulted to (0, 0)) the group is split by count into up to
+    four contiguous slices instead, so every part is strictly smaller.
+    
+    Args:
+        xs, ys: float64 coordinates of all points
+        idx: indices into xs / ys of the group (more than one point)
+    
+    Returns:
+        (center_x, center_y, quadrants) with quadrants a list of index arrays
+    """
+    center_x, center_y, qid = quadrant_split(xs[idx], ys[idx])
+    # Quadrant ids 0..3; a stable sort makes each quadrant one contiguous slice
+    order = np.argsort(qid, kind='stable')
+    bounds = np.searchsorted(qid[order], np.arange(5))
+    quadrants = [idx[order[bounds[q]:bounds[q + 1]]] for q in range(4) if bounds[q + 1] > bounds[q]]
+    if len(quadrants) == 1:
+        quadrants = [part for part in np.array_split(idx, 4) if len(part)]
+    return center_x, center_y, quadrants
+
+def count_htree_buffers(xs: np.ndarray, ys: np.ndarray, leaf_fanout: int) -> int:
+    """
+    Number of buffers an H-tree over the given sinks needs.
+    
+    Replays the partitioning of ``build_htree`` (``htree_partition``) on
+    coordinates only: every group of 2..leaf_fanout sinks takes one leaf buffer
+    and every split takes one buffer at its center; single sinks are connected
+    directly.
+    
+    Args:
+        xs, ys: float64 sink coordinates
+        leaf_fanout: Max sinks driven directly by one leaf buffer
+    
+    Returns:
+        Number of buffers the tree allocates when the pool does not run out
+    """
+    count = 0
+    stack = [np.arange(len(xs))]
+    while stack:
+        idx = stack.pop()
+        if len(idx) <= leaf_fanout:
+            count += len(idx) > 1
+            continue
+        count += 1
+        stack.extend(htree_partition(xs, ys, idx)[2])
+    return count
+
+@dataclass(slots=True)
 class TreeNode:
     x: float
     y: float
@@ -65,6 +240,187 @@ class TreeNode:
     level: int = 0
     physical_name: str = "" # The physical name of the buffer used
 
+if ORJSON_AVAILABLE:
+    def _encode_compact(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+else:
+    _encode_compact = json.JSONEncoder(separators=(',', ':')).encode
+
+def write_cts_json(cts_data: Dict[str, List[Dict]], json_path) -> None:
+    """
+    Stream CTS visualization data (sinks / buffers / connections) to a JSON file.
+    
+    Entries are encoded one at a time with the compact encoder (orjson when
+    installed, else the C encoder of ``json``) and written one per line, instead
+    of serializing the whole structure through the pure-Python indenting encoder.
+    """
+    encode = _encode_compact
+    with open(json_path, 'w') as f:
+        f.write('{')
+        for section_idx, (key, entries) in enumerate(cts_data.items()):
+            f.write(',\n' if section_idx else '\n')
+            f.write(f'{encode(key)}: [')
+            for entry_idx, entry in enumerate(entries):
+                f.write(',\n' if entry_idx else '\n')
+                f.write(encode(entry))
+            f.write('\n]' if entries else ']')
+        f.write('\n}\n')
+
+def flatten_tree(root: TreeNode) -> Tuple[List[TreeNode], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flatten a clock tree into pre-order parallel arrays.
+    
+    Only buffer (non-sink) nodes are expanded, matching how the tree is walked
+    when updating the netlist and collecting visualization data.
+    
+    Returns:
+        (nodes, parent_idx, xs, ys, is_sink) where ``nodes[i]`` is the i-th node in
+        pre-order and ``parent_idx[i]`` is the position of its parent (-1 for the root)
+    """
+    nodes: List[TreeNode] = []
+    parents: List[int] = []
+    stack = [(root, -1)]
+    while stack:
+        node, parent = stack.pop()
+        idx = len(nodes)
+        nodes.append(node)
+        parents.append(parent)
+        if not node.is_sink:
+            for child in reversed(node.children):
+                stack.append((child, idx))
+    
+    parent_idx = np.array(parents, dtype=np.intp)
+    xs = np.fromiter((n.x for n in nodes), dtype=np.float64, count=len(nodes))
+    ys = np.fromiter((n.y for n in nodes), dtype=np.float64, count=len(nodes))
+    is_sink = np.fromiter((n.is_sink for n in nodes), dtype=bool, count=len(nodes))
+    return nodes, parent_idx, xs, ys, is_sink
+
+def build_htree(nodes: List[TreeNode], get_nearest_buffer, leaf_fanout: int = 4,
+                taken_names=()) -> Optional[TreeNode]:
+    """
+    Build an H-tree structure for clock distribution.
+    H-tree provides symmetric, balanced clock distribution with minimal skew.
+    
+    Strategy:
+    1. Find geometric center of all nodes
+    2. Partition nodes into 4 quadrants around the center
+    3. Place buffer at the center
+    4. Recursively build subtrees for each quadrant, until a quadrant has
+       at most ``leaf_fanout`` nodes, which share one leaf buffer
+    
+    The recursion is unrolled onto an explicit work stack of index arrays
+    into ``nodes``; subtrees are still completed before their parent takes
+    a buffer (post-order), so buffer allocation order is unchanged.
+    
+    Buffers are named ``cts_htree_<level>_<x>_<y>``. Groups split by count
+    (coincident sinks) share level and center, so a name already given to
+    another buffer or present in ``taken_names`` gets a ``_<n>`` suffix.
+    
+    Args:
+        nodes: Sink nodes
+        get_nearest_buffer: Callable (x, y) -> {'name', 'x', 'y'} of the nearest
+            free buffer, which it marks used, or None when the pool is empty
+        leaf_fanout: Max sinks driven directly by one leaf buffer
+        taken_names: Container of cell names already in the netlist
+    
+    Returns:
+        Root node of the tree (a buffer, or the single sink); None for no nodes
+    """
+    used_names = set()
+    
+    def buffer_name(level, center_x, center_y):
+        name = base = f"cts_htree_{level}_{int(center_x)}_{int(center_y)}"
+        suffix = 1
+        while name in used_names or name in taken_names:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used_names.add(name)
+        return name
+    
+    node_x = np.array([n.x for n in nodes], dtype=np.float64)
+    node_y = np.array([n.y for n in nodes], dtype=np.float64)
+    
+    # Work items: ('visit', indices, level) expands a subtree;
+    # ('join', level, center_x, center_y, num_children, first_index) pops the
+    # finished children off `results` and buffers them.
+    stack = [('visit', np.arange(len(nodes)), 0)]
+    results = []
+    
+    while stack:
+        task = stack.pop()
+        
+        if task[0] == 'join':
+            _, level, center_x, center_y, num_children, first_index = task
+            children = results[len(results) - num_children:]
+            del results[len(results) - num_children:]
+            
+            # Create buffer at the center of this H-tree level
+            buf_info = get_nearest_buffer(center_x, center_y)
+            if buf_info is None:
+                print(f"Warning: Run out of buffers at level {level}!")
+                # Fallback: return first child if available
+                results.append(children[0] if children else nodes[first_index])
+                continue
+            
+            buf_node = TreeNode(
+                x=buf_info['x'], y=buf_info['y'],
+                cell_name=buffer_name(level, center_x, center_y),
+                is_sink=False,
+                physical_name=buf_info['name'],
+                level=level
+            )
+            buf_node.children = children
+            results.append(buf_node)
+            continue
+        
+        _, idx, level = task
+        
+        # Base case: if few nodes (≤ leaf_fanout), create direct connections
+        if len(idx) <= leaf_fanout:
+            # For small groups, just return them as children without further subdivision
+            if len(idx) == 0:
+                results.append(None)
+                continue
+            if len(idx) == 1:
+                results.append(nodes[idx[0]])
+                continue
+            
+            # For 2..leaf_fanout nodes, create a buffer and connect them directly
+            group = [nodes[i] for i in idx]
+            center_x = float(node_x[idx].sum()) / len(idx)
+            center_y = float(node_y[idx].sum()) / len(idx)
+            
+            buf_info = get_nearest_buffer(center_x, center_y)
+            if buf_info is None:
+                print("Warning: Run out of buffers!")
+                results.append(group[0])
+                continue
+            
+            buf_node = TreeNode(
+                x=buf_info['x'], y=buf_info['y'],
+                cell_name=buffer_name(level, center_x, center_y),
+                is_sink=False, 
+                physical_name=buf_info['name'],
+                level=level
+            )
+            buf_node.children = group
+            results.append(buf_node)
+            continue
+        
+        # Geometric center of the bounding box (H-tree branching point) and
+        # partition into 4 quadrants (H-tree characteristic):
+        # NE (x > c, y > c), NW (x <= c, y > c), SE (x > c, y <= c), SW (x <= c, y <= c)
+        # Coincident nodes are split by count, so every child is smaller
+        center_x, center_y, quadrants = htree_partition(node_x, node_y, idx)
+        
+        # Children for non-empty quadrants are built first (NE, NW, SE, SW order),
+        # then the join allocates this level's buffer
+        stack.append(('join', level, center_x, center_y, len(quadrants), int(idx[0])))
+        for quad_idx in reversed(quadrants):
+            stack.append(('visit', quad_idx, level + 1))
+    
+    return results[0]
+
 class VerilogWriter:
     """Simple Verilog writer for the modified netlist."""
     def __init__(self, module_name: str, ports: Dict, cells: Dict, netnames: Dict):
@@ -73,9 +429,26 @@ class VerilogWriter:
         self.cells = cells
         self.netnames = netnames
         
+        # One pass over the nets: width per net name and bit -> net name
+        self._net_widths: Dict[str, int] = {}
+        self._bit_to_name: Dict[int, str] = {}
+        for name, data in netnames.items():
+            bits = data['bits']
+            if not isinstance(bits, list): bits = [bits]
+            self._net_widths[name] = len(bits)
+            for bit in bits:
+                if isinstance(bit, int):
+                    self._bit_to_name[bit] = name
+        
     def generate(self) -> str:
-        lines = []
-        lines.append(f"module {self.module_name} (")
+        """Return the whole netlist as a string (see ``write`` for the streaming form)."""
+        buf = io.StringIO()
+        self.write(buf)
+        return buf.getvalue()
+    
+    def write(self, fp: TextIO) -> None:
+        """Stream the netlist to an open text file without materialising it in memory."""
+        fp.write(f"module {self.module_name} (\n")
         
         # Ports
         port_lines = []
@@ -88,36 +461,27 @@ class VerilogWriter:
             else:
                 port_lines.append(f"    {direction} {port_name}")
         
-        lines.append(",\n".join(port_lines))
-        lines.append(");\n")
+        fp.write(",\n".join(port_lines))
+        fp.write("\n);\n\n")
         
         # Wires
-        # Re-build bit -> name mapping
-        net_bit_to_name = {}
-        for name, data in self.netnames.items():
-            bits = data['bits']
-            if not isinstance(bits, list): bits = [bits]
-            for bit in bits:
-                if isinstance(bit, int):
-                    net_bit_to_name[bit] = name
+        net_bit_to_name = self._bit_to_name
+        net_widths = self._net_widths
 
         # Declare wires for all nets that are not ports
         port_names = set(self.ports.keys())
         
         # We should iterate over all defined nets in 'netnames'
-        sorted_nets = sorted(self.netnames.keys())
+        sorted_nets = sorted(net_widths)
         for net_name in sorted_nets:
             if net_name not in port_names:
-                # Check width
-                bits = self.netnames[net_name]['bits']
-                if not isinstance(bits, list): bits = [bits]
-                width = len(bits)
+                width = net_widths[net_name]
                 if width > 1:
-                    lines.append(f"    wire [{width-1}:0] {net_name};")
+                    fp.write(f"    wire [{width-1}:0] {net_name};\n")
                 else:
-                    lines.append(f"    wire {net_name};")
+                    fp.write(f"    wire {net_name};\n")
         
-        lines.append("")
+        fp.write("\n")
         
         # Cells
         total_cells = len(self.cells)
@@ -134,29 +498,29 @@ class VerilogWriter:
             for port, bits in connections.items():
                 if not isinstance(bits, list): bits = [bits]
                 
-                net_names_for_port = []
-                for bit in bits:
-                    if isinstance(bit, int):
-                        net_name = net_bit_to_name.get(bit, f"net_{bit}")
-                        net_names_for_port.append(net_name)
+                if len(bits) == 1:
+                    # Common case: single-bit connection, no list/join needed
+                    bit = bits[0]
+                    if type(bit) is int:
+                        net_name = net_bit_to_name.get(bit)
+                        if net_name is None:
+                            net_name = f"net_{bit}"
                     else:
-                        net_names_for_port.append(str(bit))
-                
-                if len(net_names_for_port) == 1:
-                    conn_strs.append(f".{port}({net_names_for_port[0]})")
+                        net_name = str(bit)
+                    conn_strs.append(f".{port}({net_name})")
                 else:
-                    conn_str = "{" + ", ".join(reversed(net_names_for_port)) + "}" # Verilog concat is {MSB, ..., LSB}
-                    conn_strs.append(f".{port}({conn_str})")
+                    net_names_for_port = [
+                        (net_bit_to_name.get(bit) or f"net_{bit}") if type(bit) is int else str(bit)
+                        for bit in bits
+                    ]
+                    # Verilog concat is {MSB, ..., LSB}
+                    conn_strs.append(".{}({{{}}})".format(port, ", ".join(reversed(net_names_for_port))))
             
-            lines.append(f"    {cell_type} {cell_name} (")
-            lines.append("        " + ", ".join(conn_strs))
-            lines.append("    );")
-            lines.append("")
+            fp.write(f"    {cell_type} {cell_name} (\n        {', '.join(conn_strs)}\n    );\n\n")
             
-        lines.append("endmodule")
-        return "\n".join(lines)
+        fp.write("endmodule")
 
-def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric_cells_path: str, fabric_path: str, output_dir: str, pins_path: str = None, skip_verilog: bool = False, output_prefix: str = ""):
+def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric_cells_path: str, fabric_path: str, output_dir: str, pins_path: str = None, skip_verilog: bool = False, output_prefix: str = "", leaf_fanout: int = 4):
     """
     Run ECO flow with CTS and Power-Down ECO.
     
@@ -170,7 +534,12 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         pins_path: Path to pins.yaml
         skip_verilog: If True, do not generate the final Verilog netlist
         output_prefix: Prefix to add to output files (e.g., "_rl" for RL flow)
+        leaf_fanout: Max sinks driven directly by one H-tree leaf buffer; larger
+            values give a shallower tree that uses fewer buffers (must be >= 2)
     """
+    if leaf_fanout < 2:
+        raise ValueError(f"leaf_fanout must be at least 2, got {leaf_fanout}")
+    
     print(f"Starting ECO Flow for {design_name}...")
     
     # 1. Load Data - Parse ONCE using parser
@@ -193,33 +562,27 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     # 2. Merge .map file with fabric_cells_df to get coordinates
     # Create physical_name -> (x, y) lookup from fabric_cells_df
     physical_to_coords = {}
-    for _, row in fabric_cells_df.iterrows():
-        if 'cell_name' in row and 'cell_x' in row and 'cell_y' in row:
-            physical_name = str(row['cell_name'])
-            x = float(row['cell_x'])
-            y = float(row['cell_y'])
-            physical_to_coords[physical_name] = (x, y)
-    
-    # Merge map_df with coordinates
-    mapped_placement = map_df.copy()
-    mapped_placement['x_um'] = mapped_placement['physical_cell_name'].map(
-        lambda p: physical_to_coords.get(p, (0, 0))[0]
-    )
-    mapped_placement['y_um'] = mapped_placement['physical_cell_name'].map(
-        lambda p: physical_to_coords.get(p, (0, 0))[1]
-    )
+    if {'cell_name', 'cell_x', 'cell_y'}.issubset(fabric_cells_df.columns):
+        physical_to_coords = dict(zip(
+            fabric_cells_df['cell_name'].astype(str).tolist(),
+            zip(fabric_cells_df['cell_x'].to_numpy(dtype=np.float64).tolist(),
+                fabric_cells_df['cell_y'].to_numpy(dtype=np.float64).tolist())
+        ))
     
-    # Get cell types from physical names
-    template_to_type = dict(zip(fabric_df['cell_name'], fabric_df['cell_type']))
+    # Merge map_df with coordinates (hashed left join; cells missing from the fabric land at (0, 0))
+    coords_df = fabric_cells_df[['cell_name', 'cell_x', 'cell_y']].rename(
+        columns={'cell_name': 'physical_cell_name', 'cell_x': 'x_um', 'cell_y': 'y_um'}
+    ).astype({'physical_cell_name': str, 'x_um': np.float64, 'y_um': np.float64}).drop_duplicates('physical_cell_name', keep='last')
+    mapped_placement = map_df.merge(coords_df, on='physical_cell_name', how='left', sort=False)
+    mapped_placement = mapped_placement.fillna({'x_um': 0.0, 'y_um': 0.0})
     
-    def get_cell_type(physical_name: str) -> str:
-        """Extract cell type from physical name."""
-        if '__' in physical_name:
-            template = physical_name.split('__', 1)[1]
-            return template_to_type.get(template, 'UNKNOWN')
-        return 'UNKNOWN'
+    # Get cell types from physical names (template -> Liberty cell type, built once)
+    template_to_type = dict(zip(fabric_df['cell_name'], fabric_df['cell_type']))
     
-    mapped_placement['cell_type'] = mapped_placement['physical_cell_name'].apply(get_cell_type)
+    # Cell type from the template part of the physical name (<tile>__<template>);
+    # names without a template or with an unknown one map to 'UNKNOWN'
+    placement_templates = mapped_placement['physical_cell_name'].str.split('__', n=1).str[1]
+    mapped_placement['cell_type'] = placement_templates.map(template_to_type).fillna('UNKNOWN')
     
     print("Unique cell types in placement:")
     print(mapped_placement['cell_type'].unique())
@@ -245,31 +608,27 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     print(f"Unused cells: {len(unused_cells)}")
     print(f"  (Used: {len(used_physical_cells)}, Unused: {len(unused_cells)}, Total: {len(used_physical_cells) + len(unused_cells)})")
     
-    # Filter unused by type
-    physical_to_type = {}
-    template_to_type = dict(zip(fabric_df['cell_name'], fabric_df['cell_type']))
-    
-    unused_buffers = []
-    unused_ties = []
-    unused_logic = []
-    cells_without_template = []
+    # Filter unused by type (template_to_type was built once above)
+    # Classify all unused cells at once: <tile>__<template> -> cell type -> category.
+    # Selections keep the iteration order of unused_cells.
+    unused_series = pd.Series(list(unused_cells), dtype=object)
+    unused_templates = unused_series.str.split('__', n=1).str[1]
+    has_template = unused_templates.notna()
+    unused_types = unused_templates.map(template_to_type).fillna('UNKNOWN')
+    physical_to_type = dict(zip(unused_series[has_template], unused_types[has_template]))
+    
+    unused_types_lower = unused_types.str.lower()
+    is_uncategorized = ~has_template | unused_types.eq('UNKNOWN')
+    is_buffer = ~is_uncategorized & (
+        unused_types_lower.str.contains('buf', regex=False) | unused_types_lower.str.contains('inv', regex=False)
+    )
+    is_tie = ~is_uncategorized & ~is_buffer & unused_types_lower.str.contains('conb', regex=False)
+    is_logic = ~(is_uncategorized | is_buffer | is_tie)
     
-    for phys_name in unused_cells:
-        if '__' in phys_name:
-            template = phys_name.split('__', 1)[1]
-            ctype = template_to_type.get(template, 'UNKNOWN')
-            physical_to_type[phys_name] = ctype
-            
-            if ctype == 'UNKNOWN':
-                cells_without_template.append(phys_name)
-            elif 'buf' in ctype.lower() or 'inv' in ctype.lower():
-                unused_buffers.append(phys_name)
-            elif 'conb' in ctype.lower():
-                unused_ties.append(phys_name)
-            else:
-                unused_logic.append(phys_name)
-        else:
-            cells_without_template.append(phys_name)
+    unused_buffers = unused_series[is_buffer].tolist()
+    unused_ties = unused_series[is_tie].tolist()
+    unused_logic = unused_series[is_logic].tolist()
+    cells_without_template = unused_series[is_uncategorized].tolist()
     
     print(f"Found {len(unused_buffers)} unused buffers, {len(unused_ties)} unused ties, {len(unused_logic)} unused logic cells.")
     if cells_without_template:
@@ -295,27 +654,24 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     used_dff_logical_names = {}  # Map physical -> logical for used DFFs
     
     # First, add USED DFFs (they have logical names from netlist)
-    dff_mask = mapped_placement['cell_type'].str.contains('df', case=False, na=False)
+    dff_mask = dff_type_mask(mapped_placement['cell_type'])
     used_dffs = mapped_placement[dff_mask]
     
     print(f"Adding {len(used_dffs)} used DFFs to clock tree...")
-    for _, row in used_dffs.iterrows():
+    for cell_name, physical_cell_name, x_um, y_um in used_dffs[['cell_name', 'physical_cell_name', 'x_um', 'y_um']].itertuples(index=False, name=None):
         sinks.append(TreeNode(
-            x=row['x_um'], 
-            y=row['y_um'], 
-            cell_name=row['cell_name'],  # Existing logical name
+            x=x_um, 
+            y=y_um, 
+            cell_name=cell_name,  # Existing logical name
             is_sink=True,
-            physical_name=row['physical_cell_name'] # Keep physical name
+            physical_name=physical_cell_name # Keep physical name
         ))
-        used_dff_logical_names[row['physical_cell_name']] = row['cell_name']
+        used_dff_logical_names[physical_cell_name] = cell_name
     
     # Then, add UNUSED DFFs (create logical names for them)
     # Find unused cells that are DFFs
-    unused_dffs_indices = []
-    for idx, phys_name in enumerate(unused_cells):
-        ctype = physical_to_type.get(phys_name, 'UNKNOWN')
-        if 'df' in ctype.lower():
-            unused_dffs_indices.append(phys_name)
+    # (reuses the mapped types from the unused-cell classification above)
+    unused_dffs_indices = unused_series[dff_type_mask(unused_types)].tolist()
     
     # Get coordinates for unused DFFs
     # Filter fabric_cells_df to get their coordinates
@@ -324,14 +680,13 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     print(f"Adding {len(unused_dffs_df)} unused DFFs to clock tree...")
     unused_dff_logical_names = {}  # Map physical -> logical for unused DFFs
     
-    for idx, row in unused_dffs_df.iterrows():
-        phys_name = row['cell_name']
+    for idx, phys_name, cell_x, cell_y in unused_dffs_df[['cell_name', 'cell_x', 'cell_y']].itertuples(name=None):
         # Create a logical name for the unused DFF
         logical_name = f"unused_dff_{idx}"
         
         sinks.append(TreeNode(
-            x=row['cell_x'],
-            y=row['cell_y'],
+            x=cell_x,
+            y=cell_y,
             cell_name=logical_name,  # New logical name
             is_sink=True,
             physical_name=phys_name # Crucial for adding to netlist
@@ -363,47 +718,41 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     
     print(f"Buffer pool size: {len(buffer_pool_df)}")
     
-    # OPTIMIZATION: Convert to set for O(1) lookup
-    used_buffers = set()
-    
-    # OPTIMIZATION: Pre-compute buffer coordinates as numpy array for vectorized distance calc
-    buffer_coords_array = buffer_pool_df[['x', 'y']].values.astype(np.float32)
-    buffer_names_array = buffer_pool_df['name'].values
+    # OPTIMIZATION: Pre-compute buffer coordinates as contiguous numpy arrays for vectorized distance calc
+    buffer_names_array = buffer_pool_df['name'].to_numpy()
+    buffer_x_array = buffer_pool_df['x'].to_numpy(dtype=np.float32)
+    buffer_y_array = buffer_pool_df['y'].to_numpy(dtype=np.float32)
     
     # OPTIMIZATION: Boolean mask for available buffers (True = available)
     # This is much faster than checking isin() or sets for every query
+    # Buffers are tracked by pool position only; no name set / isin checks
     buffer_availability_mask = np.ones(len(buffer_names_array), dtype=bool)
+    buffers_remaining = len(buffer_names_array)
     
     def get_nearest_buffer(target_x, target_y):
-        if len(buffer_pool_df) == 0:
+        nonlocal buffers_remaining
+        if buffers_remaining == 0:
             return None
         
-        # Check if any available using mask
-        if not buffer_availability_mask.any():
-            return None
-        
-        # Vectorized Manhattan distance calculation on AVAILABLE buffers only
-        # We use boolean indexing to get subset
-        available_indices = np.where(buffer_availability_mask)[0]
-        available_coords = buffer_coords_array[available_indices]
-        
-        distances = np.abs(available_coords[:, 0] - target_x) + np.abs(available_coords[:, 1] - target_y)
-        
-        if len(distances) == 0:
-            return None
-            
-        nearest_relative_idx = np.argmin(distances)
-        
-        # Map back to original index
-        original_idx = available_indices[nearest_relative_idx]
+        if NUMBA_AVAILABLE:
+            # Fused scan that skips used buffers, no temporary arrays
+            nearest_idx = int(_nearest_available_l1(
+                buffer_x_array, buffer_y_array, buffer_availability_mask, target_x, target_y))
+        else:
+            # Vectorized Manhattan distance over the whole pool (no subset gather);
+            # used buffers are pushed to +inf so argmin only lands on available ones
+            distances = np.abs(buffer_x_array - target_x)
+            distances += np.abs(buffer_y_array - target_y)
+            distances[~buffer_availability_mask] = np.inf
+            nearest_idx = int(distances.argmin())
         
-        nearest_name = buffer_names_array[original_idx]
-        nearest_x = float(buffer_coords_array[original_idx, 0])
-        nearest_y = float(buffer_coords_array[original_idx, 1])
+        nearest_name = buffer_names_array[nearest_idx]
+        nearest_x = float(buffer_x_array[nearest_idx])
+        nearest_y = float(buffer_y_array[nearest_idx])
         
         # Mark as used
-        buffer_availability_mask[original_idx] = False
-        used_buffers.add(nearest_name) # Keep for verification if needed
+        buffer_availability_mask[nearest_idx] = False
+        buffers_remaining -= 1
         
         return {'name': nearest_name, 'x': nearest_x, 'y': nearest_y}
 
@@ -426,11 +775,10 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         print(f"WARNING: Netlist has {original_netlist_cells} cells but .map has {len(map_df)} entries!")
     
     # Identify Clock Net using netlist_graph_df
-    # Find net connected to 'CLK' port of DFFs
-    dff_clk_connections = netlist_graph_df[
-        (netlist_graph_df['cell_type'].str.contains('df', case=False, na=False)) &
-        (netlist_graph_df['port'] == 'CLK')
-    ]
+    # Find net connected to 'CLK' port of DFFs; the cheap port equality runs over
+    # every pin first, so the DFF type test only sees the CLK pins
+    clk_pins = netlist_graph_df[netlist_graph_df['port'] == 'CLK']
+    dff_clk_connections = clk_pins[dff_type_mask(clk_pins['cell_type'])]
     
     if len(dff_clk_connections) == 0:
         print("Warning: Could not identify clock net. Skipping CTS.")
@@ -442,213 +790,149 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         print(f"Identified clock net: {clock_net_name} (bit {clock_net_bit})")
         print(f"  Found {len(dff_clk_connections)} DFF CLK connections")
     
+    # Find max net bit once; new nets (CTS, ties) are allocated upwards from
+    # next_net_bit, so later stages never need to rescan the netlist
+    max_net_bit = max(
+        (bit
+         for net_data in module['netnames'].values()
+         for bit in (net_data['bits'] if isinstance(net_data['bits'], list) else [net_data['bits']])
+         if isinstance(bit, int)),
+        default=0,
+    )
+    next_net_bit = max_net_bit + 1
+    
+    # Cells added by the ECO, counted as they are inserted (for the final breakdown)
+    cts_buffers_added = 0
+    unused_dffs_added = 0
+    tie_cells_added = 0
+    
     if clock_net_bit is not None:
         
-        # H-Tree Builder with Quadrant Partitioning
-        def build_htree(nodes, level=0, parent_x=None, parent_y=None):
-            """
-            Build an H-tree structure for clock distribution.
-            H-tree provides symmetric, balanced clock distribution with minimal skew.
-            
-            Strategy:
-            1. Find geometric center of all nodes
-            2. Partition nodes into 4 quadrants around the center
-            3. Place buffer at the center
-            4. Recursively build subtrees for each quadrant
-            """
-            # Base case: if few nodes (≤4), create direct connections
-            if len(nodes) <= 4:
-                # For small groups, just return them as children without further subdivision
-                if len(nodes) == 1:
-                    return nodes[0]
-                    
-                # For 2-4 nodes, create a buffer and connect them directly
-                if nodes:
-                    xs = [n.x for n in nodes]
-                    ys = [n.y for n in nodes]
-                    center_x = sum(xs) / len(xs)
-                    center_y = sum(ys) / len(ys)
-                    
-                    buf_info = get_nearest_buffer(center_x, center_y)
-                    if buf_info is None:
-                        print("Warning: Run out of buffers!")
-                        return nodes[0]
-                    
-                    buf_node = TreeNode(
-                        x=buf_info['x'], y=buf_info['y'],
-                        cell_name=f"cts_htree_{level}_{int(center_x)}_{int(center_y)}",
-                        is_sink=False, 
-                        physical_name=buf_info['name'],
-                        level=level
-                    )
-                    buf_node.children = nodes
-                    return buf_node
-            
-            # Find bounding box and center
-            xs = [n.x for n in nodes]
-            ys = [n.y for n in nodes]
-            min_x, max_x = min(xs), max(xs)
-            min_y, max_y = min(ys), max(ys)
-            
-            # Geometric center (H-tree branching point)
-            center_x = (min_x + max_x) / 2
-            center_y = (min_y + max_y) / 2
-            
-            # Partition nodes into 4 quadrants (H-tree characteristic)
-            quadrants = {
-                'NE': [],  # North-East: x > center, y > center
-                'NW': [],  # North-West: x <= center, y > center
-                'SE': [],  # South-East: x > center, y <= center
-                'SW': []   # South-West: x <= center, y <= center
-            }
-            
-            for node in nodes:
-                if node.x > center_x:
-                    if node.y > center_y:
-                        quadrants['NE'].append(node)
-                    else:
-                        quadrants['SE'].append(node)
-                else:
-                    if node.y > center_y:
-                        quadrants['NW'].append(node)
-                    else:
-                        quadrants['SW'].append(node)
-            
-            # Build children for non-empty quadrants
-            children = []
-            for quad_name, quad_nodes in quadrants.items():
-                if quad_nodes:
-                    child_tree = build_htree(quad_nodes, level+1, center_x, center_y)
-                    children.append(child_tree)
-            
-            # Create buffer at the center of this H-tree level
-            buf_info = get_nearest_buffer(center_x, center_y)
-            if buf_info is None:
-                print(f"Warning: Run out of buffers at level {level}!")
-                # Fallback: return first child if available
-                if children:
-                    return children[0]
-                return nodes[0] if nodes else None
-            
-            buf_node = TreeNode(
-                x=buf_info['x'], y=buf_info['y'],
-                cell_name=f"cts_htree_{level}_{int(center_x)}_{int(center_y)}",
-                is_sink=False,
-                physical_name=buf_info['name'],
-                level=level
-            )
-            buf_node.children = children
-            
-            return buf_node
-
+        # Raise the leaf fanout (up to 32) when the tree would need more buffers
+        # than the pool holds, instead of falling back to unbuffered branches
+        sink_x = np.array([n.x for n in sinks], dtype=np.float64)
+        sink_y = np.array([n.y for n in sinks], dtype=np.float64)
+        htree_fanout = leaf_fanout
+        buffers_needed = count_htree_buffers(sink_x, sink_y, htree_fanout)
+        while buffers_needed > len(buffer_names_array) and htree_fanout < 32:
+            htree_fanout = min(htree_fanout * 2, 32)
+            buffers_needed = count_htree_buffers(sink_x, sink_y, htree_fanout)
+        if htree_fanout != leaf_fanout:
+            print(f"Raised H-tree leaf fanout from {leaf_fanout} to {htree_fanout} to fit "
+                  f"the buffer pool ({buffers_needed} needed, {len(buffer_names_array)} available)")
+        
         # Build the H-tree
-        root_node = build_htree(sinks)
+        root_node = build_htree(sinks, get_nearest_buffer, htree_fanout, taken_names=module['cells'])
+        
+        # Flatten once (pre-order, parallel arrays) for the netlist update and CTS data passes
+        if isinstance(root_node, TreeNode):
+            tree_nodes, tree_parent, tree_x, tree_y, tree_is_sink = flatten_tree(root_node)
         
         # If root_node is a single sink (len(sinks)=1), we might want to add a buffer anyway?
         # Or just let it be.
         # If len(sinks) > 1, root_node will be a buffer.
         
         # Traverse and Update Netlist
-        # Find max net bit to allocate new bits
-        max_net_bit = 0
-        for net_data in module['netnames'].values():
-            for bit in net_data['bits']:
-                if isinstance(bit, int):
-                    max_net_bit = max(max_net_bit, bit)
-        
-        # Build a cache of cell_type -> port_directions from existing cells
-        # This will be used for Power-Down ECO
-        print("\nBuilding cell type port directions cache...")
-        cell_type_port_directions = {}
-        for cell_name, cell_data in module['cells'].items():
-            cell_type = cell_data.get('type', 'UNKNOWN')
-            if cell_type not in cell_type_port_directions:
-                port_directions = cell_data.get('port_directions', {})
-                if port_directions:
-                    cell_type_port_directions[cell_type] = port_directions.copy()
-        print(f"Found port_directions for {len(cell_type_port_directions)} cell types")
+        # (the cell_type -> port_directions cache is built once, in the Power-Down ECO)
 
-        next_net_bit = max_net_bit + 1
-        
         # Note: Unused DFF control pins (RESET_B, SET_B, D) are connected in the
         # Power-Down ECO phase using the NEAREST tie cell for better routing.
         # This avoids creating a single high-fanout global tie net.
         
-        def traverse_update(node, input_net_bit):
-            nonlocal next_net_bit
+        def traverse_update(root_net_bit):
+            """Walk the flattened tree in pre-order; each node is driven by its parent's output net.
             
-            if node.is_sink:
-                # DFF Connection
-                cell_name = node.cell_name
+            New cells and nets are collected in insertion order and merged into the
+            netlist with one dict.update each at the end.
+            """
+            nonlocal next_net_bit, cts_buffers_added, unused_dffs_added
+            
+            cells = module['cells']
+            new_cells = {}
+            new_net_bits = []
+            out_pin_by_template = {}
+            node_out_bit = [0] * len(tree_nodes)
+            for i, (node, parent) in enumerate(zip(tree_nodes, tree_parent.tolist())):
+                input_net_bit = root_net_bit if parent < 0 else node_out_bit[parent]
+            
+                if node.is_sink:
+                    # DFF Connection
+                    cell_name = node.cell_name
                 
-                # Check if it's an unused DFF (not in netlist yet)
-                if cell_name not in module['cells']:
-                    if not node.physical_name:
-                        print(f"Error: Unused DFF {cell_name} has no physical name!")
-                        return
+                    # Check if it's an unused DFF (not in netlist yet)
+                    cell = cells.get(cell_name)
+                    if cell is None:
+                        if not node.physical_name:
+                            print(f"Error: Unused DFF {cell_name} has no physical name!")
+                            continue
                     
-                    # Determine type - use template_to_type for proper Liberty cell type
-                    ctype = None
-                    if node.physical_name in physical_to_type:
-                        ctype = physical_to_type[node.physical_name]
-                    elif '__' in node.physical_name:
-                        # Extract template and lookup in template_to_type map
-                        template = node.physical_name.split('__', 1)[1]
-                        ctype = template_to_type.get(template, None)
+                        # Determine type - use template_to_type for proper Liberty cell type
+                        ctype = None
+                        if node.physical_name in physical_to_type:
+                            ctype = physical_to_type[node.physical_name]
+                        elif '__' in node.physical_name:
+                            # Extract template and lookup in template_to_type map
+                            template = node.physical_name.split('__', 1)[1]
+                            ctype = template_to_type.get(template, None)
                     
-                    # CRITICAL: Only add as unused_dff if it's actually a DFF
-                    # Skip non-DFF cells entirely - they'll be added during Power-Down ECO
-                    if ctype is None:
-                        return  # Can't determine type, skip
-                    if 'dfbbp' not in ctype.lower() and 'dff' not in ctype.lower():
-                        return  # Not a DFF, skip - will be handled by unused logic ECO
+                        # CRITICAL: Only add as unused_dff if it's actually a DFF
+                        # Skip non-DFF cells entirely - they'll be added during Power-Down ECO
+                        if ctype is None:
+                            continue  # Can't determine type, skip
+                        if 'dfbbp' not in ctype.lower() and 'dff' not in ctype.lower():
+                            continue  # Not a DFF, skip - will be handled by unused logic ECO
                         
-                    # Add to netlist - control pins (RESET_B, SET_B, D) will be connected 
-                    # in Power-Down ECO phase using NEAREST tie cell for better routing
-                    # Q is an output, no need to connect (will be floating but that's OK)
-                    module['cells'][cell_name] = {
-                        'type': ctype,
-                        'connections': {},  # Control pins connected later by Power-Down ECO
-                        'attributes': {'physical_name': node.physical_name, 'unused_dff': True}
-                    }
+                        # Add to netlist - control pins (RESET_B, SET_B, D) will be connected 
+                        # in Power-Down ECO phase using NEAREST tie cell for better routing
+                        # Q is an output, no need to connect (will be floating but that's OK)
+                        cell = new_cells[cell_name] = {
+                            'type': ctype,
+                            'connections': {},  # Control pins connected later by Power-Down ECO
+                            'attributes': {'physical_name': node.physical_name, 'unused_dff': True}
+                        }
+                        unused_dffs_added += 1
                 
-                cell = module['cells'][cell_name]
-                # Connect CLK. Assumes CLK pin is named 'CLK'.
-                cell['connections']['CLK'] = [input_net_bit]
-                return
-            
-            # It's a buffer
-            output_net_bit = next_net_bit
-            next_net_bit += 1
+                    # Connect CLK. Assumes CLK pin is named 'CLK'.
+                    cell['connections']['CLK'] = [input_net_bit]
+                    continue
             
-            # Add netname
-            net_name = f"cts_net_{output_net_bit}"
-            module['netnames'][net_name] = {'bits': [output_net_bit], 'attributes': {}}
+                # It's a buffer
+                output_net_bit = next_net_bit
+                next_net_bit += 1
             
-            # Determine buffer type and output pin
-            phys_name = node.physical_name
-            if '__' in phys_name:
-                template = phys_name.split('__', 1)[1]
-            else:
-                # Fallback if somehow physical name is bad
-                template = 'sky130_fd_sc_hd__buf_1'
+                # Add netname (cts_net_<bit>, named when merged below)
+                new_net_bits.append(output_net_bit)
             
-            # Determine output pin: Inverters use 'Y', Buffers use 'X'
-            out_pin = 'Y' if 'inv' in template.lower() else 'X'
+                # Determine buffer type and output pin
+                phys_name = node.physical_name
+                if '__' in phys_name:
+                    template = phys_name.split('__', 1)[1]
+                else:
+                    # Fallback if somehow physical name is bad
+                    template = 'sky130_fd_sc_hd__buf_1'
+            
+                # Determine output pin: Inverters use 'Y', Buffers use 'X' (once per template)
+                out_pin = out_pin_by_template.get(template)
+                if out_pin is None:
+                    out_pin = out_pin_by_template[template] = 'Y' if 'inv' in template.lower() else 'X'
+            
+                # Add cell (build_htree gives every buffer a unique name)
+                cts_buffers_added += 1
+                new_cells[node.cell_name] = {
+                    'type': template,
+                    'connections': {
+                        'A': [input_net_bit],
+                        out_pin: [output_net_bit] # Dynamic pin name
+                    },
+                    'attributes': {'physical_name': phys_name, 'is_cts_buffer': True}
+                }
             
-            # Add cell
-            module['cells'][node.cell_name] = {
-                'type': template,
-                'connections': {
-                    'A': [input_net_bit],
-                    out_pin: [output_net_bit] # Dynamic pin name
-                },
-                'attributes': {'physical_name': phys_name, 'is_cts_buffer': True}
-            }
+                node_out_bit[i] = output_net_bit
             
-            # Recurse
-            for child in node.children:
-                traverse_update(child, output_net_bit)
+            cells.update(new_cells)
+            module['netnames'].update(
+                {f"cts_net_{bit}": {'bits': [bit], 'attributes': {}} for bit in new_net_bits}
+            )
 
 
         if isinstance(root_node, TreeNode):
@@ -662,16 +946,10 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
                 # We can check the netlist for the top-level port name connected to the clock net
                 # But for now, let's assume 'clk' or try to find it.
                 
-                # Find the port name connected to clock_net_name in the top module
-                clock_port_name = None
-                for port_name, port_data in module['ports'].items():
-                    # Check if this port is connected to the clock net
-                    # Port bits are usually mapped to net bits
-                    # This is a bit complex to reverse without a full netlist graph, 
-                    # but usually the port name IS the net name for top-level ports.
-                    if port_name == clock_net_name:
-                        clock_port_name = port_name
-                        break
+                # Find the port name connected to clock_net_name in the top module.
+                # Reversing port bits to nets would need the full netlist graph,
+                # but for top-level ports the port name IS the net name.
+                clock_port_name = clock_net_name if clock_net_name in module['ports'] else None
                 
                 if not clock_port_name:
                     # Fallback: look for 'clk' in pins
@@ -713,40 +991,38 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
                 else:
                     print(f"Warning: Clock pin '{clock_port_name}' not found in pins file.")
 
-            traverse_update(root_node, clock_net_bit)
+            traverse_update(clock_net_bit)
             print("CTS Netlist update complete.")
             
             # Save CTS Data for Visualization
             print("Saving CTS data for visualization...")
             
-            def collect_cts_data(node):
-                if not node.is_sink:
+            # Pre-order over the flattened tree: the edge from a node's parent is
+            # recorded just before the node itself, as in a recursive walk
+            xs_list = tree_x.tolist()
+            ys_list = tree_y.tolist()
+            for node, parent, x, y, is_sink in zip(tree_nodes, tree_parent.tolist(), xs_list, ys_list, tree_is_sink.tolist()):
+                if parent >= 0:
+                    cts_data['connections'].append({
+                        'from': {'x': xs_list[parent], 'y': ys_list[parent]},
+                        'to': {'x': x, 'y': y}
+                    })
+                if not is_sink:
                     cts_data['buffers'].append({
                         'name': node.cell_name,
                         'physical_name': node.physical_name,
-                        'x': float(node.x),
-                        'y': float(node.y),
+                        'x': x,
+                        'y': y,
                         'level': node.level
                     })
-                    for child in node.children:
-                        cts_data['connections'].append({
-                            'from': {'x': float(node.x), 'y': float(node.y)},
-                            'to': {'x': float(child.x), 'y': float(child.y)}
-                        })
-                        collect_cts_data(child)
-            
-            if isinstance(root_node, TreeNode):
-                collect_cts_data(root_node)
                 
             cts_json_path = Path(output_dir) / f"{design_name}_cts.json"
-            with open(cts_json_path, 'w') as f:
-                json.dump(cts_data, f, indent=2)
+            write_cts_json(cts_data, cts_json_path)
             print(f"CTS data written to {cts_json_path}")
     else:
         print("CTS skipped (could not identify clock net).")
         cts_json_path = Path(output_dir) / f"{design_name}_cts.json"
-        with open(cts_json_path, 'w') as f:
-            json.dump(cts_data, f, indent=2)
+        write_cts_json(cts_data, cts_json_path)
         print(f"CTS data written to {cts_json_path}")
 
     # In CTS visualization mode, avoid the very expensive ECO passes.
@@ -755,23 +1031,25 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         print("Writing CTS-only ECO placement map (skip_verilog mode)...")
 
         eco_map_path = Path(output_dir) / f"{design_name}_eco.map"
-        with open(eco_map_path, 'w') as f:
+        # Each section is formatted as a list of lines and written in one call
+        with open(eco_map_path, 'w', buffering=1 << 20) as f:
             f.write(f"# ECO-updated placement mapping file for {design_name}\n")
             f.write("# Format: logical_cell_name physical_cell_name\n")
             f.write("# Generated by htree_builder.py ECO flow (CTS-only mode)\n\n")
 
-            original_count = 0
-            for _, row in map_df.iterrows():
-                f.write(f"{row['cell_name']} {row['physical_cell_name']}\n")
-                original_count += 1
+            lines = [f"{cell_name} {phys}\n" for cell_name, phys in
+                     zip(map_df['cell_name'].to_numpy(), map_df['physical_cell_name'].to_numpy())]
+            f.write("".join(lines))
+            original_count = len(lines)
 
             f.write("\n# CTS buffer mappings\n")
-            cts_count = 0
-            for buf in cts_data.get('buffers', []):
-                if buf.get('physical_name') == 'PIN' or str(buf.get('name', '')).startswith('PIN_'):
-                    continue
-                f.write(f"{buf['name']} {buf['physical_name']}\n")
-                cts_count += 1
+            lines = [
+                f"{buf['name']} {buf['physical_name']}\n"
+                for buf in cts_data.get('buffers', [])
+                if not (buf.get('physical_name') == 'PIN' or str(buf.get('name', '')).startswith('PIN_'))
+            ]
+            f.write("".join(lines))
+            cts_count = len(lines)
 
         print(f"CTS-only .map written to {eco_map_path}")
         print(f"  - Original mappings: {original_count}")
@@ -793,6 +1071,31 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
 
     print(f"Found port_directions for {len(cell_type_port_directions)} cell types")
     
+    # Types missing from the netlist borrow the port directions of the first known
+    # type with the same base name (e.g. "nand2" for nand2_1 vs nand2_2)
+    def base_cell_name(cell_type):
+        return cell_type.split('__')[-1].split('_')[0] if '__' in cell_type else cell_type.split('_')[0]
+    
+    port_directions_by_base = {}
+    for known_type, known_dirs in cell_type_port_directions.items():
+        port_directions_by_base.setdefault(base_cell_name(known_type), known_dirs)
+    
+    # cell_type -> (port_directions, input_ports), or None without port info;
+    # resolved once per type for both the pre-count and the tie pass
+    port_info_by_type = {}
+    
+    def get_port_info(cell_type):
+        if cell_type not in port_info_by_type:
+            port_directions = (cell_type_port_directions.get(cell_type)
+                               or port_directions_by_base.get(base_cell_name(cell_type)))
+            if port_directions:
+                input_ports = [port for port, direction in port_directions.items()
+                               if direction.lower() == 'input']
+                port_info_by_type[cell_type] = (port_directions, input_ports)
+            else:
+                port_info_by_type[cell_type] = None
+        return port_info_by_type[cell_type]
+    
     # Step 2: Distributed tie cell approach
     if not unused_ties:
         print("Warning: No unused tie cells (conb_1) found. Skipping Power-Down ECO.")
@@ -807,12 +1110,8 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         skipped_unknown = 0
         
         for phys_name in unused_logic:
-            # Get cell type from physical name
-            if '__' in phys_name:
-                template = phys_name.split('__', 1)[1]
-                cell_type = template_to_type.get(template, 'UNKNOWN')
-            else:
-                cell_type = physical_to_type.get(phys_name, 'UNKNOWN')
+            # Get cell type from physical name (precomputed for every unused cell with a template)
+            cell_type = physical_to_type.get(phys_name, 'UNKNOWN')
             
             if cell_type == 'UNKNOWN':
                 skipped_unknown += 1
@@ -823,25 +1122,13 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
                 skipped_taps_decap += 1
                 continue
             
-            # Get port_directions for this cell type
-            port_directions = cell_type_port_directions.get(cell_type)
-            if not port_directions:
-                # Try to find a similar cell type
-                for known_type, known_dirs in cell_type_port_directions.items():
-                    base_known = known_type.split('__')[-1].split('_')[0] if '__' in known_type else known_type.split('_')[0]
-                    base_current = cell_type.split('__')[-1].split('_')[0] if '__' in cell_type else cell_type.split('_')[0]
-                    if base_known == base_current:
-                        port_directions = known_dirs
-                        break
-                
-                if not port_directions:
-                    skipped_no_port_info += 1
-                    continue
-            
-            # Extract input ports only
-            input_ports = [port for port, direction in port_directions.items() 
-                          if direction.lower() == 'input']
+            # Get port_directions (or a similar cell type's) and input ports
+            port_info = get_port_info(cell_type)
+            if port_info is None:
+                skipped_no_port_info += 1
+                continue
             
+            _, input_ports = port_info
             if not input_ports:
                 skipped_no_inputs += 1
                 continue
@@ -873,16 +1160,6 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         selected_tie_cells = unused_ties.copy() if isinstance(unused_ties, list) else list(unused_ties)
         print(f"Using ALL {len(selected_tie_cells)} tie cells for distribution")
         
-        # Find max net bit (in case CTS added nets)
-        max_net_bit = 0
-        for net_data in module['netnames'].values():
-            bits = net_data.get('bits', [])
-            if not isinstance(bits, list):
-                bits = [bits]
-            for bit in bits:
-                if isinstance(bit, int):
-                    max_net_bit = max(max_net_bit, bit)
-        
         # Create local tie nets for each tie cell
         # We will store the net bits for each tie cell index
         tie_nets_map = {} # idx -> {'low': bit, 'high': bit}
@@ -894,7 +1171,8 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
             'HI': 'output'
         })
         
-        current_net_bit = max_net_bit + 1
+        # Continue after the last bit allocated so far (original nets + CTS nets)
+        current_net_bit = next_net_bit
         
         for idx, tie_cell_physical_name in enumerate(selected_tie_cells):
             # Create local nets for this tie cell
@@ -928,6 +1206,7 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
                     'physical_name': tie_cell_physical_name
                 }
             }
+            tie_cells_added += 1
         
             print(f"Added {len(selected_tie_cells)} tie cells with local nets")
         
@@ -935,17 +1214,10 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         def should_tie_high(port_name: str) -> bool:
             """
             Active-low signals (ending in _B, _N, _n) should be tied HIGH.
-            Regular inputs should be tied LOW.
+            Regular inputs (including clocks) should be tied LOW.
             """
-            port_upper = port_name.upper()
-            # Active-low signals (ending in _B or _N)
-            if port_upper.endswith('_B') or port_upper.endswith('_N'):
-                return True
-            # Clock signals should typically be tied low (though unused DFFs shouldn't exist)
-            if 'CLK' in port_upper:
-                return False
-            # Default: tie low
-            return False
+            # Only the 2-char suffix matters; no full-name upper() / substring scans
+            return port_name[-2:].upper() in ACTIVE_LOW_SUFFIXES
         
         # Step 6: Build spatial assignment map (which tie cell is nearest to each unused cell)
         # This is for statistics - all unused cells connect to the same tie nets
@@ -958,17 +1230,34 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         # Track assignment statistics
         tie_cell_assignments = {idx: 0 for idx in range(len(selected_tie_cells))}
         
+        # Nearest tie cell for every unused cell that may be tied, resolved in one
+        # batched NumPy query instead of a Python scan over all tie cells per cell
+        nearest_tie_for_phys = {}
+        if tie_cell_coords_map:
+            tie_idx_array = np.fromiter(tie_cell_coords_map.keys(), dtype=np.intp, count=len(tie_cell_coords_map))
+            tie_xy = np.array(list(tie_cell_coords_map.values()), dtype=np.float64)
+            query_names = [p for p in list(unused_logic) + unused_dffs_df['cell_name'].astype(str).tolist()
+                           if p in physical_to_coords]
+            if query_names:
+                query_xy = np.array([physical_to_coords[p] for p in query_names], dtype=np.float64)
+                nearest = nearest_point_indices(query_xy[:, 0], query_xy[:, 1], tie_xy[:, 0], tie_xy[:, 1])
+                nearest_tie_for_phys = dict(zip(query_names, tie_idx_array[nearest].tolist()))
+        
         # Step 7: Add unused logic cells to netlist with tied inputs
         unused_logic_added = 0
         cells_without_port_info = set()
+        tie_pattern_by_type = {}  # cell_type -> [(input_port, tie_high)]
         
         # Load leakage optimal vectors
         optimal_vectors = {}
         json_path = Path("inputs") / "leakage_optimal_vectors.json"
         if json_path.exists():
             print(f"Loading leakage optimization vectors from {json_path}")
-            with open(json_path, 'r') as f:
-                optimal_vectors = json.load(f)
+            if ORJSON_AVAILABLE:
+                optimal_vectors = orjson.loads(json_path.read_bytes())
+            else:
+                with open(json_path, 'r') as f:
+                    optimal_vectors = json.load(f)
         else:
             print("Warning: leakage_optimal_vectors.json not found. Using default tying logic.")
 
@@ -983,12 +1272,8 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
              print(f"Filtered {len(dff_phys_set)} unused DFFs from unused logic list (Size: {original_len} -> {len(unused_logic)})")
 
         for phys_name in unused_logic:
-            # Get cell type from physical name
-            if '__' in phys_name:
-                template = phys_name.split('__', 1)[1]
-                cell_type = template_to_type.get(template, 'UNKNOWN')
-            else:
-                cell_type = physical_to_type.get(phys_name, 'UNKNOWN')
+            # Get cell type from physical name (precomputed for every unused cell with a template)
+            cell_type = physical_to_type.get(phys_name, 'UNKNOWN')
             
             if cell_type == 'UNKNOWN':
                 print(f"Warning: Could not determine cell type for {phys_name}, skipping")
@@ -998,26 +1283,13 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
             if 'tap' in cell_type.lower() or 'decap' in cell_type.lower() or 'conb' in cell_type.lower():
                 continue
             
-            # Get port_directions for this cell type
-            port_directions = cell_type_port_directions.get(cell_type)
-            if not port_directions:
-                # Try to find a similar cell type (e.g., nand2_1 vs nand2_2)
-                for known_type, known_dirs in cell_type_port_directions.items():
-                    # Extract base name (e.g., "nand2" from "sky130_fd_sc_hd__nand2_1")
-                    base_known = known_type.split('__')[-1].split('_')[0] if '__' in known_type else known_type.split('_')[0]
-                    base_current = cell_type.split('__')[-1].split('_')[0] if '__' in cell_type else cell_type.split('_')[0]
-                    if base_known == base_current:
-                        port_directions = known_dirs
-                        break
-                
-                if not port_directions:
-                    cells_without_port_info.add(cell_type)
-                    continue
-            
-            # Extract input ports only
-            input_ports = [port for port, direction in port_directions.items() 
-                          if direction.lower() == 'input']
+            # Get port_directions (or a similar cell type's, e.g. nand2_1 vs nand2_2)
+            port_info = get_port_info(cell_type)
+            if port_info is None:
+                cells_without_port_info.add(cell_type)
+                continue
             
+            port_directions, input_ports = port_info
             if not input_ports:
                 continue  # Skip cells with no inputs
             
@@ -1026,16 +1298,8 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
             
             # Find nearest tie cell for statistics (all connect to same nets anyway)
             if tie_cell_coords_map:
-                unused_coords = physical_to_coords.get(phys_name)
-                if unused_coords:
-                    min_dist = float('inf')
-                    nearest_tie_idx = 0
-                    for tie_idx, tie_coords in tie_cell_coords_map.items():
-                        dist = ((unused_coords[0] - tie_coords[0])**2 + 
-                               (unused_coords[1] - tie_coords[1])**2)**0.5
-                        if dist < min_dist:
-                            min_dist = dist
-                            nearest_tie_idx = tie_idx
+                if phys_name in nearest_tie_for_phys:
+                    nearest_tie_idx = nearest_tie_for_phys[phys_name]
                     tie_cell_assignments[nearest_tie_idx] += 1
             
 
@@ -1047,29 +1311,28 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
                 print(f"Error: No tie nets found for index {nearest_tie_idx}")
                 continue
                 
-            connections = {}
-            
             # Check for optimal vector for this cell type
             # Strip template if present to match parser output names if needed?
             # Parser seems to use full names like "sky130_fd_sc_hd__nand2_1"
             # Our cell_type variable should match that.
+            # The per-port tie value depends only on the cell type, so it is resolved
+            # once per type; each cell then just picks its nearest tie cell's nets.
+            tie_pattern = tie_pattern_by_type.get(cell_type)
+            if tie_pattern is None:
+                cell_optimal = optimal_vectors.get(cell_type, {})
+                tie_pattern = []
+                for port in input_ports:
+                    if port in cell_optimal:
+                        tie_val = cell_optimal[port]
+                    else:
+                        # Fallback to heuristic
+                        tie_val = 1 if should_tie_high(port) else 0
+                    tie_pattern.append((port, tie_val == 1))
+                tie_pattern_by_type[cell_type] = tie_pattern
             
-            cell_optimal = optimal_vectors.get(cell_type, {})
-            
-            for port in input_ports:
-                # Determine tie value (0 or 1)
-                tie_val = 0 # Default low
-                
-                if port in cell_optimal:
-                    tie_val = cell_optimal[port]
-                else:
-                    # Fallback to heuristic
-                    tie_val = 1 if should_tie_high(port) else 0
-                
-                if tie_val == 1:
-                    connections[port] = [tie_nets['high']]
-                else:
-                    connections[port] = [tie_nets['low']]
+            tie_high_bit = tie_nets['high']
+            tie_low_bit = tie_nets['low']
+            connections = {port: [tie_high_bit if tie_high else tie_low_bit] for port, tie_high in tie_pattern}
             
             # Add cell to netlist
             module['cells'][logical_name] = {
@@ -1103,19 +1366,10 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
             if not phys_name or not tie_cell_coords_map:
                 continue
             
-            # Find nearest tie cell
-            dff_coords = physical_to_coords.get(phys_name)
-            if not dff_coords:
+            # Find nearest tie cell (precomputed in the batched query above)
+            nearest_tie_idx = nearest_tie_for_phys.get(phys_name)
+            if nearest_tie_idx is None:
                 continue
-                
-            min_dist = float('inf')
-            nearest_tie_idx = 0
-            for tie_idx, tie_coords in tie_cell_coords_map.items():
-                dist = ((dff_coords[0] - tie_coords[0])**2 + 
-                       (dff_coords[1] - tie_coords[1])**2)**0.5
-                if dist < min_dist:
-                    min_dist = dist
-                    nearest_tie_idx = tie_idx
             
             # Get the tie nets for this tie cell
             tie_nets = tie_nets_map.get(nearest_tie_idx)
@@ -1159,9 +1413,7 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
             print(f"  - Fanout: {min_fanout} - {max_fanout} cells per tie cell (avg: {actual_avg:.0f})")
         
         # Count cells added during ECO
-        cts_buffers_added = len([c for c in module['cells'].keys() if c.startswith('cts_htree_')])
-        tie_cells_added = len([c for c in module['cells'].keys() if c.startswith('tie_cell_')])
-        unused_cells_added = len([c for c in module['cells'].keys() if c.startswith('unused_')])
+        unused_cells_added = unused_dffs_added + unused_logic_added
         original_cells = len(module['cells']) - cts_buffers_added - tie_cells_added - unused_cells_added
         
         print(f"\nCell count breakdown:")
@@ -1229,8 +1481,7 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     claimed_physicals = set()
     
     # 1. From placement map
-    for _, row in map_df.iterrows():
-        claimed_physicals.add(row['physical_cell_name'])
+    claimed_physicals.update(map_df['physical_cell_name'].tolist())
         
     # 2. From module cells (checking attributes)
     for cell_name, cell_data in module['cells'].items():
@@ -1247,9 +1498,7 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     instantiated_count = 0
     fabric_inst_count = 0
     
-    for idx, row in fabric_cells_df.iterrows():
-        phys_name = str(row['cell_name'])
-        
+    for phys_name in fabric_cells_df['cell_name'].astype(str).tolist():
         if phys_name in claimed_physicals:
             continue
             
@@ -1296,19 +1545,16 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
 
     print(f"Added {instantiated_count} remaining fabric cells to netlist.")
     
-    print("Generating Verilog...")
-    writer = VerilogWriter(top_module_name, module['ports'], module['cells'], module['netnames'])
-    verilog_code = writer.generate()
     # 5. Generate Verilog
     if not skip_verilog:
         print("Generating Verilog...")
         writer = VerilogWriter(top_module_name, module['ports'], module['cells'], module['netnames'])
-        verilog_code = writer.generate()
         
         output_path = Path(output_dir) / f"{design_name}{output_prefix}_final.v"
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, 'w') as f:
-            f.write(verilog_code)
+        # Large write buffer: the writer emits many short fragments per cell
+        with open(output_path, 'w', buffering=1 << 20) as f:
+            writer.write(f)
             
         print(f"Verilog written to {output_path}")
     else:
@@ -1332,90 +1578,76 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
     # Track which physical cells have been written to avoid duplicates
     written_physicals = set()
     
-    with open(eco_map_path, 'w') as f:
+    # Each section is collected as (logical, physical) pairs and written in one call
+    def write_section(f, pairs):
+        f.write("".join([f"{logical} {phys}\n" for logical, phys in pairs]))
+        written_physicals.update(phys for _, phys in pairs)
+        return len(pairs)
+    
+    with open(eco_map_path, 'w', buffering=1 << 20) as f:
         f.write(f"# ECO-updated placement mapping file for {design_name}\n")
         f.write("# Format: logical_cell_name physical_cell_name\n")
         f.write("# Generated by htree_builder.py ECO flow\n\n")
         
         # 1. Original mappings from placement
-        original_count = 0
-        for _, row in map_df.iterrows():
-            phys = row['physical_cell_name']
-            f.write(f"{row['cell_name']} {phys}\n")
-            written_physicals.add(phys)
-            original_count += 1
+        original_count = write_section(f, list(zip(
+            map_df['cell_name'].to_numpy(), map_df['physical_cell_name'].to_numpy())))
             
         # 2. CTS buffer mappings
         f.write(f"\n# CTS buffer mappings\n")
-        cts_count = 0
-        for buf in cts_data['buffers']:
-            # Do not include the synthetic PIN node in the placement map.
-            if buf.get('physical_name') == 'PIN' or str(buf.get('name', '')).startswith('PIN_'):
-                continue
-            phys = buf['physical_name']
-            f.write(f"{buf['name']} {phys}\n")
-            written_physicals.add(phys)
-            cts_count += 1
+        # Do not include the synthetic PIN node in the placement map.
+        cts_count = write_section(f, [
+            (buf['name'], buf['physical_name'])
+            for buf in cts_data['buffers']
+            if not (buf.get('physical_name') == 'PIN' or str(buf.get('name', '')).startswith('PIN_'))
+        ])
             
         # 3. Tie cell mappings
         f.write(f"\n# Tie cell mappings\n")
-        tie_count = 0
-        for idx, tie_phys_name in enumerate(selected_tie_cells):
-            phys = tie_phys_name
-            tie_logical_name = f"tie_cell_{idx}"
-            f.write(f"{tie_logical_name} {phys}\n")
-            written_physicals.add(phys)
-            tie_count += 1
+        tie_count = write_section(f, [
+            (f"tie_cell_{idx}", tie_phys_name) for idx, tie_phys_name in enumerate(selected_tie_cells)
+        ])
         
         # Note: cts_tie_cell removed - unused DFF control pins now use nearest tie cells
             
         # 4. Unused DFF mappings (added for complete clock coverage)
-        f.write(f"\n# Unused DFF mappings (added for complete clock coverage)\n")
-        dff_count = 0
-        for cell_name, cell_data in module['cells'].items():
-            if cell_data.get('attributes', {}).get('unused_dff', False):
-                phys = cell_data.get('attributes', {}).get('physical_name')
-                if phys:
-                    phys = str(phys).strip()
-                    f.write(f"{cell_name} {phys}\n")
-                    written_physicals.add(phys)
-                    dff_count += 1
-        
         # 5. Unused logic cell mappings (tied for power-down)
-        f.write(f"\n# Unused logic cell mappings (tied for power-down)\n")
-        unused_logic_count = 0
+        # One pass over the netlist cells fills both sections
+        dff_pairs = []
+        unused_logic_pairs = []
         for cell_name, cell_data in module['cells'].items():
-            # Check for 'unused_' prefix and ensure it's not one of the DFFs we just wrote
-            if cell_name.startswith('unused_') and not cell_data.get('attributes', {}).get('unused_dff', False):
-                phys = cell_data.get('attributes', {}).get('physical_name')
+            attributes = cell_data.get('attributes', {})
+            if attributes.get('unused_dff', False):
+                phys = attributes.get('physical_name')
+                if phys:
+                    dff_pairs.append((cell_name, str(phys).strip()))
+            # Check for 'unused_' prefix and ensure it's not one of the DFFs above
+            elif cell_name.startswith('unused_'):
+                phys = attributes.get('physical_name')
                 
                 # Fallback extraction
                 if not phys:
                     phys = cell_name[7:]
                 
                 if phys:
-                    phys = str(phys).strip()
-                    f.write(f"{cell_name} {phys}\n")
-                    written_physicals.add(phys)
-                    unused_logic_count += 1
+                    unused_logic_pairs.append((cell_name, str(phys).strip()))
+        
+        f.write(f"\n# Unused DFF mappings (added for complete clock coverage)\n")
+        dff_count = write_section(f, dff_pairs)
+        
+        f.write(f"\n# Unused logic cell mappings (tied for power-down)\n")
+        unused_logic_count = write_section(f, unused_logic_pairs)
                 
         # 6. Remaining Fabric Cells (The duplicate counting fix!)
         f.write(f"\n# Remaining Unused Fabric Cells\n")
-        remaining_count = 0
         
         print(f"Processing remaining fabric cells (Total: {len(fabric_cells_df)})...")
-        # We can optimize this but let's just loop for correctness
-        for idx, row in fabric_cells_df.iterrows():
-            phys = str(row['cell_name']).strip()
-            
-            if phys not in written_physicals:
-                # Name it fabric_<physical_name>
-                f.write(f"fabric_{phys} {phys}\n")
-                remaining_count += 1
-                
-                # Optional: print progress for large fabrics
-                if remaining_count % 50000 == 0:
-                     print(f"  Written {remaining_count} remaining fabric cells...")
+        remaining = [phys for phys in fabric_cells_df['cell_name'].astype(str).str.strip().tolist()
+                     if phys not in written_physicals]
+        # Name them fabric_<physical_name>
+        f.write("".join([f"fabric_{phys} {phys}\n" for phys in remaining]))
+        remaining_count = len(remaining)
+        print(f"  Written {remaining_count} remaining fabric cells")
 
     total = original_count + cts_count + tie_count + dff_count + unused_logic_count + remaining_count
     print(f"ECO .map file written to {eco_map_path}")
@@ -1448,8 +1680,7 @@ def run_eco_flow(design_name: str, netlist_path: str, map_file_path: str, fabric
         # We must write it first.
         
         cts_json_path = Path(output_dir) / f"{design_name}_cts.json"
-        with open(cts_json_path, 'w') as f:
-            json.dump(cts_data, f, indent=2)
+        write_cts_json(cts_data, cts_json_path)
         print(f"CTS Data written to {cts_json_path}")
         
         vis_output_path = Path(output_dir) / "cts_visualization.html"
@@ -1483,6 +1714,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run H-Tree CTS and ECO generation.")
     parser.add_argument("design", nargs="?", default="arith", help="Design name (default: arith)")
     parser.add_argument("--skip_verilog", action="store_true", help="Skip Verilog netlist generation (useful for CTS visualization only)")
+    parser.add_argument("--leaf_fanout", type=int, default=4, help="Max sinks per H-tree leaf buffer (default: 4)")
     
     args = parser.parse_args()
     design_name = args.design
@@ -1520,5 +1752,6 @@ if __name__ == "__main__":
         fabric_path=str(fabric_path),
         output_dir=str(output_dir),
         pins_path=str(pins_path),
-        skip_verilog=args.skip_verilog
+        skip_verilog=args.skip_verilog,
+        leaf_fanout=args.leaf_fanout
     )
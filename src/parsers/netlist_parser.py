@@ -11,6 +11,13 @@ import json
 from typing import Dict, Tuple
 import pandas as pd
 
+# Optional: faster (and lighter) JSON parsing for large Yosys netlists
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 class NetlistParser:
     """Parser for Yosys JSON netlist files using pandas DataFrames."""
@@ -41,8 +48,12 @@ class NetlistParser:
             - netlist_graph_db: DataFrame with columns [cell_name, cell_type, port, net_bit, net_name, direction]
         """
         # Load JSON file
-        with open(self.json_file_path, 'r') as f:
-            self.data = json.load(f)
+        if ORJSON_AVAILABLE:
+            with open(self.json_file_path, 'rb') as f:
+                self.data = orjson.loads(f.read())
+        else:
+            with open(self.json_file_path, 'r') as f:
+                self.data = json.load(f)
         
         # Find the top module (usually "sasic_top" or the module with "top" attribute)
         self.top_module = self._find_top_module()
@@ -216,20 +216,20 @@ write_def $::env(OUTPUT_DIR)/${design_name}${output_suffix}_routed.def
 write_db $::env(OUTPUT_DIR)/${design_name}${output_suffix}_routed.odb
 
 # DRC gate: fail the flow if any violations are present
-if {[file exists $drc_rpt]} {
-    set fp [open $drc_rpt r]
-    set drc_txt [read $fp]
-    close $fp
-    set vio_count [regexp -all -line {^violation type:} $drc_txt]
-    puts "\[Generic-Route\] DRC violations: $vio_count (report: $drc_rpt)"
-    if {$vio_count > 0} {
-        puts stderr "\[Generic-Route\] ERROR: DRC violations detected ($vio_count)."
-        exit 2
-    }
-} else {
+# Open once and treat a failed open as "report missing" (no separate exists check)
+if {[catch {open $drc_rpt r} fp]} {
     puts stderr "\[Generic-Route\] ERROR: DRC report not found: $drc_rpt"
     exit 2
 }
+fconfigure $fp -buffersize 1048576
+set drc_txt [read $fp]
+close $fp
+set vio_count [regexp -all -line {^violation type:} $drc_txt]
+puts "\[Generic-Route\] DRC violations: $vio_count (report: $drc_rpt)"
+if {$vio_count > 0} {
+    puts stderr "\[Generic-Route\] ERROR: DRC violations detected ($vio_count)."
+    exit 2
+}
 
 
 puts "\[Generic-Route\] Completed."
@@ -9,7 +9,9 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
-from src.cts.htree_builder import run_eco_flow
+import numpy as np
+
+from src.cts.htree_builder import run_eco_flow, count_htree_buffers, htree_partition, build_htree, TreeNode
 
 def verify_power_down_eco(verilog_path: Path, netlist_path: Path, design_name: str):
     """Verify Power-Down ECO was implemented correctly."""
@@ -113,6 +115,82 @@ def verify_power_down_eco(verilog_path: Path, netlist_path: Path, design_name: s
     
     return True
 
+def _make_sinks(xs, ys):
+    return [TreeNode(x=float(x), y=float(y), cell_name=f"dff_{i}", is_sink=True) for i, (x, y) in enumerate(zip(xs, ys))]
+
+def _buffer_pool(size):
+    """get_nearest_buffer stand-in handing out a row of buffers in order."""
+    taken = []
+    def get_nearest_buffer(target_x, target_y):
+        if len(taken) == size:
+            return None
+        taken.append(len(taken))
+        return {'name': f"T0Y0__R0_BUF_{len(taken)}", 'x': float(len(taken)), 'y': 0.0}
+    return get_nearest_buffer, taken
+
+def _tree_buffers(root):
+    buffers = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if not node.is_sink:
+            buffers.append(node)
+            stack.extend(node.children)
+    return buffers
+
+def test_htree_partition_coincident_sinks():
+    """Coincident sinks (e.g. unplaced DFFs at (0, 0)) must still split into smaller groups."""
+    xs = np.zeros(9)
+    ys = np.zeros(9)
+    idx = np.arange(9)
+    
+    _, _, quadrants = htree_partition(xs, ys, idx)
+    
+    assert len(quadrants) > 1
+    assert all(len(q) < len(idx) for q in quadrants)
+    assert sorted(np.concatenate(quadrants).tolist()) == idx.tolist()
+
+def test_count_htree_buffers_coincident_sinks():
+    """Buffer count terminates for more than leaf_fanout sinks at one x,y."""
+    # 5 sinks at one point: one split buffer plus one leaf buffer for the pair
+    assert count_htree_buffers(np.zeros(5), np.zeros(5), 4) == 2
+    # Mixed: a cluster of coincident sinks plus a few spread ones. The 40 at (0, 0)
+    # split by count 40 -> 10 -> 3/3/2/2 (1 + 4 + 16 buffers), plus the root, the
+    # SW quadrant split and the leaf for the two far sinks
+    xs = np.concatenate([np.zeros(40), np.array([10.0, 20.0, 30.0])])
+    ys = np.concatenate([np.zeros(40), np.array([5.0, 15.0, 25.0])])
+    assert count_htree_buffers(xs, ys, 4) == 24
+    
+    # Must match what build_htree actually allocates and names
+    get_nearest_buffer, taken = _buffer_pool(1000)
+    root = build_htree(_make_sinks(xs, ys), get_nearest_buffer, 4)
+    buffers = _tree_buffers(root)
+    assert len(taken) == len(buffers) == 24
+    assert len({b.cell_name for b in buffers}) == 24
+
+def test_build_htree_coincident_sinks_unique_names():
+    """Groups split by count share level and center; their buffers must still get distinct names."""
+    xs = np.concatenate([np.zeros(40), np.array([10.0, 20.0, 30.0])])
+    ys = np.concatenate([np.zeros(40), np.array([5.0, 15.0, 25.0])])
+    get_nearest_buffer, _ = _buffer_pool(1000)
+    
+    root = build_htree(_make_sinks(xs, ys), get_nearest_buffer, 4, taken_names={'cts_htree_0_15_12'})
+    names = [b.cell_name for b in _tree_buffers(root)]
+    
+    assert len(names) == len(set(names))
+    assert 'cts_htree_0_15_12' not in names
+    assert 'cts_htree_0_15_12_1' in names
+
+def test_htree_partition_matches_quadrants():
+    """Spread sinks keep the NE, NW, SE, SW quadrant split around the bounding-box center."""
+    xs = np.array([3.0, 1.0, 3.0, 1.0])
+    ys = np.array([3.0, 3.0, 1.0, 1.0])
+    
+    center_x, center_y, quadrants = htree_partition(xs, ys, np.arange(4))
+    
+    assert (center_x, center_y) == (2.0, 2.0)
+    assert [q.tolist() for q in quadrants] == [[0], [1], [2], [3]]
+
 def test_cts():
     design_name = "6502"
     